@@ -1,8 +1,6 @@
-from flask import Flask
-import os
-from flask_sqlalchemy import SQLAlchemy
+from flask import Flask, request
+import click
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from .models import db
 from datetime import timedelta
 
@@ -14,26 +12,101 @@ def create_app(config_object='config.DevConfig'):
     app.config.from_object(config_object)
     # Session / remember configuration
     app.config.setdefault('REMEMBER_COOKIE_DURATION', timedelta(days=1))
+    # Outside debug mode app.logger would inherit the root logger's WARNING level and drop
+    # every info line (engine settings, webhook hits, downgrades) under gunicorn
+    if not app.debug:
+        app.logger.setLevel(app.config.get('LOG_LEVEL', 'INFO'))
 
     # Init extensions
     db.init_app(app)
+    from .database import configure_engines
+    configure_engines(app)
     login_manager.init_app(app)
-    Migrate(app, db)
+    # Flask-Migrate pulls in alembic (~150ms); web workers only need it to run upgrades
+    if app.config.get('EAGER_MIGRATE') or click.get_current_context(silent=True) is not None:
+        init_migrate(app)
     # Canonical application domain for external links / absolute URLs
     app.config.setdefault('CANONICAL_DOMAIN', 'brandvoice.live')
     # Default sender config (used by Mailtrap API helper)
     app.config.setdefault('MAIL_DEFAULT_SENDER', ("BrandVoice Support", "support@brandvoice.live"))
+    # Static paths whose file names are content hashes (safe to cache forever)
+    app.config.setdefault('IMMUTABLE_STATIC_PREFIXES', ('uploads/logos/', 'dist/'))
+
+    @app.after_request
+    def _immutable_static_cache(response):
+        if request.endpoint == 'static' and response.status_code in (200, 304):
+            filename = (request.view_args or {}).get('filename') or ''
+            if filename.startswith(tuple(app.config['IMMUTABLE_STATIC_PREFIXES'])):
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = 31536000
+                response.cache_control.immutable = True
+        return response
+
+    # Server-Timing header + slow request log (SQL / gateway / template time)
+    from . import instrumentation
+    instrumentation.init_app(app)
+    # Opt-in profiler (only when PROFILING_TOKEN is set)
+    from . import profiling
+    profiling.init_app(app)
+
+    # Password hash method / cost (rehash on login when it changes)
+    from . import passwords
+    passwords.init_app(app)
+    # Token-bucket limits for preview / auth endpoints
+    from . import ratelimit
+    ratelimit.init_app(app)
+    # Codec for compressed payload columns (WebhookLog.payload_json, Payment.raw_meta)
+    from . import compression
+    compression.init_app(app)
+    # `flask purge-audit-logs` (retention for webhook / callback / failed email logs)
+    from . import retention
+    retention.init_app(app)
+    # `flask db-backup` (online SQLite snapshots)
+    from . import backup
+    backup.init_app(app)
+    # `flask rebuild-invoice-stats` (dashboard aggregates backfill)
+    from . import invoice_stats
+    invoice_stats.init_app(app)
+
+    # Built CSS bundle helpers for templates
+    from . import static_assets
+    static_assets.init_app(app)
 
     # Register blueprints
     from .auth import auth_bp
     from .routes import main_bp
     from .routes_generate import main_generate_bp
+    from .metrics import metrics_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
     app.register_blueprint(main_generate_bp)
+    app.register_blueprint(metrics_bp)
 
     return app
 
+def warm(app):
+    """Compile every template and import the lazily-loaded dependencies (call before forking)."""
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            if name.endswith('.html'):
+                app.jinja_env.get_template(name)
+        # Deferred for single-process cold starts; in a preforked server load them once here
+        from .payments import _requests
+        from .logos import _pil
+        from .utils_mail import _mailtrap
+        _requests()
+        _pil()
+        _mailtrap()
+    return app
+
+def init_migrate(app):
+    """Attach Flask-Migrate (needed by `flask db ...` and flask_migrate.upgrade())."""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    return app.extensions['migrate']
+
 @login_manager.user_loader
 def load_user(user_id):
     from .models import User
@@ -1,17 +1,20 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from .models import db, User
 from itsdangerous import URLSafeTimedSerializer
-from datetime import datetime, timedelta
-import secrets
+from datetime import datetime
+from urllib.parse import urlparse, urlunparse
 from .utils_mail import safe_send_mail
+from .ratelimit import rate_limited
+from .passwords import hash_password, verify_password, needs_rehash
+from .password_reset import RESET_EXP_MINUTES, issue_reset_token, find_reset_token, consume_reset_tokens
 
 # NOTE: Email sending now uses Mailtrap API via utils_mail.safe_send_mail.
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@rate_limited('login', methods=('POST',))
 def login():
     if current_user.is_authenticated:
         return redirect(url_for('main.dashboard'))
@@ -19,7 +22,12 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password_hash, password):
+        if user and verify_password(user.password_hash, password):
+            if needs_rehash(user.password_hash):
+                # Stored with an older hash policy: upgrade while we have the plaintext
+                user.password_hash = hash_password(password)
+                db.session.commit()
+                current_app.logger.info('Password rehashed on login user_id=%s', user.id)
             login_user(user, remember=True)
             # Redirect to dashboard (no forced payment)
             return redirect(url_for('main.dashboard'))
@@ -27,6 +35,7 @@ def login():
     return render_template('login.html')
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@rate_limited('register', methods=('POST',))
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.dashboard'))
@@ -36,7 +45,8 @@ def register():
         if User.query.filter_by(email=email).first():
             flash('Email already registered', 'error')
         else:
-            user = User(email=email, password_hash=generate_password_hash(password), trial_start=datetime.utcnow())
+            user = User(email=email, password_hash=hash_password(password), trial_start=datetime.utcnow())
+            user.refresh_access_expiry()
             db.session.add(user)
             db.session.commit()
             login_user(user, remember=True)
@@ -45,9 +55,8 @@ def register():
     return render_template('register.html')
 
 
-RESET_EXP_MINUTES = 30
-
 @auth_bp.route('/forgot', methods=['GET', 'POST'])
+@rate_limited('forgot_password', methods=('POST',))
 def forgot_password():
     if request.method == 'POST':
         email = (request.form.get('email') or '').strip().lower()
@@ -57,15 +66,12 @@ def forgot_password():
             current_app.logger.info('Password reset requested for non-existent email=%s', email)
             flash('Email does not exist', 'error')
             return redirect(url_for('auth.forgot_password'))
-        token = secrets.token_urlsafe(48)
-        user.password_reset_token = token
-        user.password_reset_sent_at = datetime.utcnow()
+        token = issue_reset_token(user)
         db.session.commit()
         reset_link = url_for('auth.reset_password', token=token, _external=True)
         canonical = current_app.config.get('CANONICAL_DOMAIN')
         if canonical:
             try:
-                from urllib.parse import urlparse, urlunparse
                 parts = urlparse(reset_link)
                 if parts.hostname in {'localhost', '127.0.0.1'} or (parts.hostname and parts.hostname.endswith('.onrender.com')):
                     reset_link = urlunparse((parts.scheme, canonical, parts.path, parts.params, parts.query, parts.fragment))
@@ -84,23 +90,22 @@ def forgot_password():
 
 @auth_bp.route('/reset/<token>', methods=['GET', 'POST'])
 def reset_password(token):
-    user = User.query.filter_by(password_reset_token=token).first()
-    if not user:
+    reset = find_reset_token(token)
+    if reset is None:
         flash('Invalid or expired reset link.', 'error')
         return redirect(url_for('auth.forgot_password'))
-    # Expire after RESET_EXP_MINUTES
-    if user.password_reset_sent_at and datetime.utcnow() - user.password_reset_sent_at > timedelta(minutes=RESET_EXP_MINUTES):
-        flash('Reset link expired. Please request a new one.', 'error')
-        return redirect(url_for('auth.forgot_password'))
     if request.method == 'POST':
         pw1 = request.form.get('password')
         pw2 = request.form.get('password_confirm')
         if not pw1 or pw1 != pw2:
             flash('Passwords do not match.', 'error')
+        elif not consume_reset_tokens(reset):
+            # Used by a concurrent request between lookup and submit
+            flash('Invalid or expired reset link.', 'error')
+            return redirect(url_for('auth.forgot_password'))
         else:
-            user.password_hash = generate_password_hash(pw1)
-            user.password_reset_token = None
-            user.password_reset_sent_at = None
+            user = db.session.get(User, reset.user_id)
+            user.password_hash = hash_password(pw1)
             db.session.commit()
             flash('Password updated. You can now login.', 'success')
             return redirect(url_for('auth.login'))
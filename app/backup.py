@@ -0,0 +1,169 @@
+"""`flask db-backup`: consistent snapshots of the SQLite database while the app is running.
+
+Copying the .db file while workers write can capture a torn page or miss the WAL, so
+this uses SQLite's online backup API instead: pages are copied --pages at a time, and the
+source is only locked for the duration of each step, with --pause seconds between steps
+for writers to get in. If another connection writes mid-way, SQLite restarts the copy
+from a fresh read, so the snapshot is always a single committed state (after a few
+restarts the copy falls back to a single step).
+
+The snapshot is written to <dir>/<name>-YYYYmmddHHMMSS.db.part, must pass
+PRAGMA integrity_check, then is optionally gzipped and renamed into place; a failed or
+interrupted run never leaves a file that looks like a backup. Afterwards only the newest
+--keep snapshots of that database are kept.
+"""
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from .models import db
+
+
+def sqlite_path() -> str:
+    """Filesystem path of the primary SQLite database (ClickException on other backends)."""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise click.ClickException(f'db-backup only handles SQLite files (got {url.get_backend_name()}); '
+                                   'use pg_dump or provider snapshots for Postgres')
+    return url.database
+
+
+def _fsync_replace(tmp_path: str, path: str):
+    with open(tmp_path, 'rb') as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+class _Restarted(Exception):
+    pass
+
+
+def online_backup(source: str, target: str, pages: int = 1024, pause: float = 0.01, max_restarts: int = 3) -> int:
+    """Copy source to target with the backup API, pages per step; returns the page count.
+
+    A steady stream of writes can restart a stepped copy forever; after max_restarts the
+    copy is redone in a single step (one read transaction, which in WAL mode does not
+    block writers either).
+    """
+    state = {'pages': 0, 'remaining': None, 'restarts': 0}
+
+    def progress(status, remaining, page_count):
+        state['pages'] = page_count
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _Restarted()
+        state['remaining'] = remaining
+        if remaining and pause:
+            time.sleep(pause)  # source lock is released between steps
+
+    src = sqlite3.connect(source, timeout=30)
+    try:
+        dst = sqlite3.connect(target)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=progress)
+            except _Restarted:
+                current_app.logger.info('db-backup: source changed %s times mid-copy; copying in one step',
+                                        state['restarts'])
+                src.backup(dst, pages=-1)
+                state['pages'] = dst.execute('PRAGMA page_count').fetchone()[0]
+            # The copy inherits WAL mode from the source; a snapshot should be one self-contained file
+            dst.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    return state['pages']
+
+
+def integrity_check(path: str, quick: bool = False) -> str:
+    """'ok' or the first problems reported by PRAGMA integrity_check / quick_check."""
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = conn.execute('PRAGMA quick_check' if quick else 'PRAGMA integrity_check').fetchall()
+    finally:
+        conn.close()
+    return '; '.join(r[0] for r in rows[:5])
+
+
+def rotate(backup_dir: str, stem: str, keep: int) -> list:
+    """Delete all but the newest keep snapshots of stem in backup_dir; returns removed paths."""
+    pattern = re.compile(rf'^{re.escape(stem)}-\d{{14}}\.db(\.gz)?$')
+    snapshots = sorted(name for name in os.listdir(backup_dir) if pattern.match(name))
+    removed = []
+    for name in snapshots[:-keep] if keep > 0 else []:
+        path = os.path.join(backup_dir, name)
+        os.remove(path)
+        removed.append(path)
+    return removed
+
+
+def backup_database(backup_dir: str, compress: bool = False, keep: int = 0, pages: int = 1024,
+                    pause: float = 0.01, quick: bool = False) -> dict:
+    source = sqlite_path()
+    os.makedirs(backup_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    path = os.path.join(backup_dir, f'{stem}-{datetime.now():%Y%m%d%H%M%S}.db')
+    part = path + '.part'
+    temps = [part]
+    started = time.perf_counter()
+    try:
+        page_count = online_backup(source, part, pages, pause)
+        check = integrity_check(part, quick)
+        if check != 'ok':
+            raise click.ClickException(f'Snapshot failed integrity check: {check}')
+        if compress:
+            path += '.gz'
+            temps.append(path + '.part')
+            with open(part, 'rb') as src, gzip.open(temps[-1], 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        _fsync_replace(temps[-1], path)
+    finally:
+        for tmp in temps:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return {
+        'path': path,
+        'pages': page_count,
+        'source_bytes': os.path.getsize(source),
+        'bytes': os.path.getsize(path),
+        'seconds': time.perf_counter() - started,
+        'removed': rotate(backup_dir, stem, keep),
+    }
+
+
+@click.command('db-backup')
+@click.option('--dir', 'backup_dir', help='Destination directory (default BACKUP_DIR).')
+@click.option('--compress/--no-compress', default=None, help='Gzip the snapshot (default BACKUP_COMPRESS).')
+@click.option('--keep', type=int, help='Newest snapshots to keep, this one included (default BACKUP_KEEP, 0 = all).')
+@click.option('--pages', type=int, default=1024, show_default=True, help='Pages copied per step.')
+@click.option('--pause', type=float, default=0.01, show_default=True, help='Seconds to sleep between steps.')
+@click.option('--quick', is_flag=True, help='PRAGMA quick_check instead of the full integrity_check.')
+def db_backup_command(backup_dir, compress, keep, pages, pause, quick):
+    """Snapshot the SQLite database with the online backup API (see app/backup.py)."""
+    cfg = current_app.config
+    result = backup_database(
+        backup_dir or cfg['BACKUP_DIR'],
+        compress=cfg['BACKUP_COMPRESS'] if compress is None else compress,
+        keep=cfg['BACKUP_KEEP'] if keep is None else keep,
+        pages=pages, pause=pause, quick=quick,
+    )
+    click.echo(f"{result['path']}: {result['pages']} pages, {result['source_bytes']} -> {result['bytes']} bytes, "
+               f"integrity ok, {result['seconds']:.1f}s")
+    for path in result['removed']:
+        click.echo(f'removed {path}')
+
+
+def init_app(app):
+    app.config.setdefault('BACKUP_DIR', None)
+    if not app.config['BACKUP_DIR']:
+        app.config['BACKUP_DIR'] = os.path.join(os.path.dirname(app.root_path), 'backups')
+    app.config.setdefault('BACKUP_KEEP', 14)
+    app.config.setdefault('BACKUP_COMPRESS', False)
+    app.cli.add_command(db_backup_command)
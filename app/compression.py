@@ -0,0 +1,88 @@
+"""Compressed storage for large text blobs (webhook payloads, verify snapshots).
+
+Values are stored as LargeBinary: a 5-byte header b"BVZ1" + codec, then the body.
+Codecs: b"z" zlib, b"s" zstd (needs the optional `zstandard` package), b"n" stored
+as-is (values under COMPRESS_MIN_BYTES, or when compression would not shrink them).
+PAYLOAD_COMPRESSION picks the codec for new writes; every codec is always readable, so
+switching it never requires rewriting old rows. Bytes without the header are read as
+plain UTF-8 text.
+"""
+import zlib
+from flask import current_app, has_app_context
+
+MAGIC = b'BVZ1'
+COMPRESS_MIN_BYTES = 128
+CODECS = {'zlib': b'z', 'zstd': b's', 'none': b'n'}
+DEFAULT_LEVELS = {'zlib': 6, 'zstd': 3}
+
+_zstd_module = None
+
+
+def _zstd():
+    """The zstandard module, or None when it is not installed."""
+    global _zstd_module
+    if _zstd_module is None:
+        try:
+            import zstandard  # type: ignore
+            _zstd_module = zstandard
+        except ImportError:
+            _zstd_module = False
+    return _zstd_module or None
+
+
+def _settings():
+    if not has_app_context():
+        return 'zlib', None
+    cfg = current_app.config
+    return cfg.get('PAYLOAD_COMPRESSION', 'zlib'), cfg.get('PAYLOAD_COMPRESSION_LEVEL')
+
+
+def compress_text(value, codec: str = None, level: int = None):
+    """Encode value (str) for a LargeBinary column; None stays None."""
+    if value is None:
+        return None
+    if codec is None:
+        codec, level = _settings()
+    raw = value.encode('utf-8') if isinstance(value, str) else bytes(value)
+    if codec == 'none' or len(raw) < COMPRESS_MIN_BYTES:
+        return MAGIC + b'n' + raw
+    level = DEFAULT_LEVELS[codec] if level is None else level
+    if codec == 'zstd':
+        body = _zstd().ZstdCompressor(level=level).compress(raw)
+    else:
+        body = zlib.compress(raw, level)
+    if len(body) >= len(raw):
+        return MAGIC + b'n' + raw
+    return MAGIC + CODECS[codec] + body
+
+
+def decompress_text(blob):
+    """Decode a value written by compress_text (or legacy plain text bytes); None stays None."""
+    if blob is None:
+        return None
+    blob = bytes(blob)  # psycopg2 returns memoryview for bytea
+    if not blob.startswith(MAGIC):
+        return blob.decode('utf-8', errors='replace')
+    codec, body = blob[4:5], blob[5:]
+    if codec == b'z':
+        body = zlib.decompress(body)
+    elif codec == b's':
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError('zstd-compressed value but the zstandard package is not installed')
+        body = zstd.ZstdDecompressor().decompress(body)
+    elif codec != b'n':
+        raise ValueError(f'Unknown compression codec {codec!r}')
+    return body.decode('utf-8')
+
+
+def init_app(app):
+    app.config.setdefault('PAYLOAD_COMPRESSION', 'zlib')
+    app.config.setdefault('PAYLOAD_COMPRESSION_LEVEL', None)
+    codec = app.config['PAYLOAD_COMPRESSION']
+    if codec not in CODECS:
+        raise ValueError(f'Unsupported PAYLOAD_COMPRESSION {codec!r} (use zlib, zstd or none)')
+    if codec == 'zstd' and _zstd() is None:
+        app.logger.warning('PAYLOAD_COMPRESSION=zstd but zstandard is not installed; using zlib')
+        app.config['PAYLOAD_COMPRESSION'] = 'zlib'
+        app.config['PAYLOAD_COMPRESSION_LEVEL'] = None
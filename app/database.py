@@ -0,0 +1,82 @@
+"""Engine setup applied in create_app: SQLite pragmas, replica routing and a log of effective settings."""
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
+from sqlalchemy import event
+from .models import db, RoutingSession, REPLICA_BIND
+
+# Flask session key holding the time of the user's last committed write
+WROTE_AT_KEY = '_db_wrote_at'
+
+
+def _sqlite_pragma_listener(pragmas: dict):
+    def on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cur.execute(f'PRAGMA {name}={value}')
+        cur.close()
+    return on_connect
+
+
+def _mark_wrote(sess, _flush_context):
+    sess.info['wrote'] = True
+
+
+def _remember_commit(sess):
+    # Stamp the user's (signed cookie) session so their next reads stay on the primary
+    if sess.info.pop('wrote', False) and has_request_context():
+        session[WROTE_AT_KEY] = time.time()
+
+
+def _forget_writes(sess):
+    sess.info.pop('wrote', None)
+
+
+event.listen(RoutingSession, 'after_flush', _mark_wrote)
+event.listen(RoutingSession, 'after_commit', _remember_commit)
+event.listen(RoutingSession, 'after_rollback', _forget_writes)
+
+
+def replica_reads(view):
+    """Route the view's queries to the replica bind (if configured).
+
+    Reads stay on the primary for REPLICA_STICKY_SECONDS after the same user committed a
+    write, so a redirect after saving never shows stale replica data. Views that gate access
+    on subscription state (generate_get / generate_form) are left on the primary: webhook
+    writes happen outside the user's session, so stickiness would not cover them.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        wrote_at = session.get(WROTE_AT_KEY)
+        sticky = wrote_at is not None and time.time() - wrote_at < current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        g.db_use_replica = not sticky
+        try:
+            return view(*args, **kwargs)
+        finally:
+            # after_request hooks and teardown writes must see the primary again
+            g.pop('db_use_replica', None)
+    return wrapper
+
+
+def configure_engines(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        for key, engine in db.engines.items():
+            applied = {}
+            if engine.dialect.name == 'sqlite' and pragmas:
+                event.listen(engine, 'connect', _sqlite_pragma_listener(pragmas))
+                applied = pragmas
+            options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') if key is None else app.config['SQLALCHEMY_BINDS'].get(key)
+            if isinstance(options, dict):
+                options = {k: v for k, v in options.items() if k != 'url'}
+            app.logger.info(
+                'DB engine bind=%s url=%s dialect=%s pool=%s options=%s pragmas=%s',
+                key or 'primary',
+                engine.url.render_as_string(hide_password=True),
+                engine.dialect.name,
+                type(engine.pool).__name__,
+                options or {},
+                applied,
+            )
+        if REPLICA_BIND in db.engines:
+            app.logger.info('Read replica enabled; sticky window %ss after writes', app.config.get('REPLICA_STICKY_SECONDS'))
@@ -0,0 +1,38 @@
+"""Conditional GET helpers (ETag / Last-Modified) for per-user pages."""
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional
+from flask import current_app, make_response, request
+from werkzeug.http import is_resource_modified
+
+
+def template_version(name: str) -> int:
+    """Modification stamp of a template file (changes on deploy/edit)."""
+    try:
+        return os.stat(os.path.join(current_app.root_path, current_app.template_folder, name)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def make_etag(*parts) -> str:
+    return hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None):
+    """Return a 304 response if the client's cached copy is current, else None."""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return cacheable('', etag, last_modified, status=304)
+
+
+def cacheable(body, etag: str, last_modified: Optional[datetime] = None, status: int = 200):
+    """Wrap a rendered page with validators and a private, always-revalidate policy."""
+    resp = make_response(body, status)
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    resp.vary.add('Cookie')
+    return resp
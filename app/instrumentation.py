@@ -0,0 +1,145 @@
+"""Per-request timing: wall time, SQL statements, gateway/mail HTTP and template rendering.
+
+Logs requests slower than SLOW_REQUEST_MS with their most expensive queries. The
+Server-Timing header is only sent when SERVER_TIMING is on, or to requests presenting
+SERVER_TIMING_TOKEN in X-Server-Timing-Token: it reveals query counts and timings.
+"""
+import hmac
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Queries listed in a slow-request log line
+TOP_QUERIES = 5
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.queries = []  # (ms, statement)
+        self.ext_ms = 0.0
+        self.ext_calls = 0
+        self.ext_by_name = {}  # name -> ms
+        self.render_ms = 0.0
+        self._render_started = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+
+def current_timings():
+    """The active request's RequestTimings, or None outside an instrumented request."""
+    if not has_request_context():
+        return None
+    return g.get('_timings')
+
+
+@contextmanager
+def external_call(name: str):
+    """Time an outbound HTTP call (payment gateway, mail API) against the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings()
+        if timings is not None:
+            ms = (time.perf_counter() - started) * 1000
+            timings.ext_ms += ms
+            timings.ext_calls += 1
+            timings.ext_by_name[name] = timings.ext_by_name.get(name, 0.0) + ms
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started:
+        return
+    ms = (time.perf_counter() - started.pop()) * 1000
+    timings = current_timings()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_ms += ms
+        timings.queries.append((ms, statement))
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute is skipped for failed statements; drop their start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('_query_started'):
+        conn.info['_query_started'].pop()
+
+
+def _before_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings._render_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None and timings._render_started:
+        timings.render_ms += (time.perf_counter() - timings._render_started.pop()) * 1000
+
+
+def server_timing_header(timings: RequestTimings, total_ms: float) -> str:
+    return ', '.join([
+        f'app;dur={total_ms:.1f}',
+        f'db;dur={timings.sql_ms:.1f};desc="{timings.sql_count} queries"',
+        f'ext;dur={timings.ext_ms:.1f};desc="{timings.ext_calls} calls"',
+        f'tpl;dur={timings.render_ms:.1f}',
+    ])
+
+
+def _wants_server_timing(app) -> bool:
+    if app.config['SERVER_TIMING']:
+        return True
+    token = app.config.get('SERVER_TIMING_TOKEN') or ''
+    provided = request.headers.get('X-Server-Timing-Token', '')
+    return bool(token and provided) and hmac.compare_digest(provided.encode(), token.encode())
+
+
+def init_app(app):
+    app.config.setdefault('REQUEST_TIMING', True)
+    app.config.setdefault('SERVER_TIMING', False)
+    app.config.setdefault('SLOW_REQUEST_MS', 1000)
+    if not app.config['REQUEST_TIMING']:
+        return
+
+    # Engine-class listeners cover the primary and any replica bind
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_timing():
+        g._timings = RequestTimings()
+
+    @app.after_request
+    def _finish_timing(response):
+        timings = g.pop('_timings', None)
+        if timings is None:
+            return response
+        total_ms = timings.elapsed_ms()
+        app.logger.debug('Request timing endpoint=%s status=%s total_ms=%.1f sql_count=%s sql_ms=%.1f',
+                         request.endpoint, response.status_code, total_ms, timings.sql_count, timings.sql_ms)
+        if _wants_server_timing(app):
+            response.headers['Server-Timing'] = server_timing_header(timings, total_ms)
+        if total_ms >= app.config['SLOW_REQUEST_MS'] and request.endpoint != 'static':
+            top = sorted(timings.queries, key=lambda q: q[0], reverse=True)[:TOP_QUERIES]
+            app.logger.warning(
+                'Slow request endpoint=%s method=%s status=%s total_ms=%.1f sql_count=%s sql_ms=%.1f ext_ms=%.1f ext=%s render_ms=%.1f top_queries=%s',
+                request.endpoint, request.method, response.status_code, total_ms, timings.sql_count,
+                timings.sql_ms, timings.ext_ms, {k: round(v, 1) for k, v in timings.ext_by_name.items()}, timings.render_ms,
+                ['%.1fms %s' % (ms, ' '.join(stmt.split())[:200]) for ms, stmt in top],
+            )
+        return response
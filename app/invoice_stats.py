@@ -0,0 +1,147 @@
+"""Per-user invoice aggregates for the dashboard (invoice_stat table).
+
+Invoices are append-only, so the aggregates are kept up to date incrementally: finalizing
+an invoice bumps three rows in the same transaction (record_invoice):
+
+  period='YYYY-MM', client_key=''        invoices / total billed that month
+  period='',        client_key=''        all time
+  period='',        client_key=<client>  all time for one client (normalized name)
+
+The dashboard then reads its numbers with one indexed query (dashboard_stats) instead of
+scanning the user's invoices. `flask rebuild-invoice-stats` recomputes the rows from the
+invoice table: run it once after the add_invoice_stat_table migration, and after any
+manual change to invoices.
+"""
+from collections import defaultdict
+from datetime import datetime
+import click
+from sqlalchemy import select, union_all
+from .models import db, Invoice, InvoiceStat
+
+ALL = ''  # period / client_key of the all-time and all-clients rows
+TOP_CLIENTS = 5
+
+
+def month_key(when: datetime) -> str:
+    return f'{when:%Y-%m}'
+
+
+def client_display(name) -> str:
+    return ' '.join((name or '').split())[:255]
+
+
+def client_key(name) -> str:
+    """Case / whitespace-insensitive client identity ('' when there is no client name)."""
+    return client_display(name).lower()
+
+
+def _insert(dialect_name: str):
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _bump(user_id: int, period: str, key: str, name, amount: float, at: datetime):
+    """Add one invoice to a stat row, creating it if needed (INSERT .. ON CONFLICT DO UPDATE)."""
+    table = InvoiceStat.__table__
+    insert = _insert(db.session.get_bind(InvoiceStat).dialect.name)
+    stmt = insert(table).values(user_id=user_id, period=period, client_key=key, client_name=name,
+                                invoice_count=1, total_billed=amount, last_invoice_at=at)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'period', 'client_key'],
+        set_={
+            'invoice_count': table.c.invoice_count + 1,
+            'total_billed': table.c.total_billed + stmt.excluded.total_billed,
+            'client_name': stmt.excluded.client_name,
+            'last_invoice_at': stmt.excluded.last_invoice_at,
+        },
+    ))
+
+
+def record_invoice(inv):
+    """Add a just-finalized invoice to its owner's stats (caller commits, with the invoice)."""
+    at = inv.created_at or datetime.utcnow()
+    amount = float(inv.total_amount or 0.0)
+    _bump(inv.user_id, month_key(at), ALL, None, amount, at)
+    _bump(inv.user_id, ALL, ALL, None, amount, at)
+    key = client_key(inv.client_name)
+    if key:
+        _bump(inv.user_id, ALL, key, client_display(inv.client_name), amount, at)
+
+
+def dashboard_stats(user_id: int, now: datetime = None, top: int = TOP_CLIENTS) -> dict:
+    """{'month_count', 'month_total', 'total_count', 'total_billed', 'top_clients': [(name, count, total)]}."""
+    month = month_key(now or datetime.utcnow())
+    s = InvoiceStat
+    columns = (s.period, s.client_key, s.client_name, s.invoice_count, s.total_billed)
+    totals = select(*columns).where(s.user_id == user_id, s.client_key == ALL, s.period.in_((month, ALL)))
+    clients = (select(*columns)
+               .where(s.user_id == user_id, s.period == ALL, s.client_key != ALL)
+               .order_by(s.total_billed.desc(), s.invoice_count.desc())
+               .limit(top).subquery())
+    rows = db.session.execute(union_all(totals, select(clients))).all()
+
+    out = {'month_count': 0, 'month_total': 0.0, 'total_count': 0, 'total_billed': 0.0, 'top_clients': []}
+    for period, key, name, count, total in rows:
+        if key != ALL:
+            out['top_clients'].append((name or key, count, total))
+        elif period == month:
+            out['month_count'], out['month_total'] = count, total
+        else:
+            out['total_count'], out['total_billed'] = count, total
+    out['top_clients'].sort(key=lambda c: (c[2], c[1]), reverse=True)
+    return out
+
+
+def _aggregate(invoices) -> dict:
+    """{(period, client_key): [client_name, count, total, last_at]} for one user's invoices."""
+    stats = defaultdict(lambda: [None, 0, 0.0, None])
+    for created_at, name, amount in invoices:
+        at = created_at or datetime.utcnow()
+        keys = [(month_key(at), ALL, None), (ALL, ALL, None)]
+        if client_key(name):
+            keys.append((ALL, client_key(name), client_display(name)))
+        for period, key, display in keys:
+            row = stats[(period, key)]
+            row[1] += 1
+            row[2] += float(amount or 0.0)
+            if row[3] is None or at >= row[3]:
+                row[0], row[3] = display, at
+    return stats
+
+
+def rebuild_user_stats(user_id: int) -> int:
+    """Recompute user_id's stat rows from their invoices (caller commits); returns rows written."""
+    invoices = db.session.execute(
+        select(Invoice.created_at, Invoice.client_name, Invoice.total_amount).where(Invoice.user_id == user_id)
+    ).all()
+    InvoiceStat.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    rows = [
+        {'user_id': user_id, 'period': period, 'client_key': key, 'client_name': name,
+         'invoice_count': count, 'total_billed': total, 'last_invoice_at': at}
+        for (period, key), (name, count, total, at) in _aggregate(invoices).items()
+    ]
+    if rows:
+        db.session.execute(InvoiceStat.__table__.insert(), rows)
+    return len(rows)
+
+
+@click.command('rebuild-invoice-stats')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only these users (default: everyone with invoices).')
+def rebuild_invoice_stats_command(user_ids):
+    """Recompute the dashboard's invoice stats from the invoice table (one transaction per user)."""
+    if not user_ids:
+        # Users holding stat rows but no invoices any more get their rows cleared too
+        user_ids = sorted(set(db.session.execute(select(Invoice.user_id).distinct()).scalars())
+                          | set(db.session.execute(select(InvoiceStat.user_id).distinct()).scalars()))
+    written = 0
+    for user_id in user_ids:
+        written += rebuild_user_stats(user_id)
+        db.session.commit()
+    click.echo(f'Rebuilt invoice stats for {len(user_ids)} users ({written} rows)')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_invoice_stats_command)
@@ -0,0 +1,188 @@
+"""Brand logo storage: re-encode, downscale and store under content-hash names."""
+import base64
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+from flask import current_app, url_for
+
+LOGO_DIR = 'uploads/logos'
+# Bounded renditions (longest side in px). Templates draw the logo at most 80 CSS px
+# (h-20), so md stays sharp in print at ~300 dpi; no larger rendition is needed
+LOGO_SIZES = {'sm': 128, 'md': 256}
+DEFAULT_SIZE = 'md'
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+# Templates rendering the logo smaller than the default rendition
+TEMPLATE_LOGO_SIZES = {
+    'invoice_template_2.html': 'sm',
+}
+DATA_URI_CACHE_DIR = 'logo_cache'
+_DATA_URI_CACHE_MAX = 256
+
+# (absolute path, mtime_ns, size) -> data URI ('' = too large to inline)
+_data_uri_cache: Dict[Tuple[str, int, str], str] = {}
+_data_uri_lock = threading.Lock()
+_pil_modules = None
+
+
+def _pil():
+    """(Image, ImageOps) imported on first use (keeps Pillow out of app startup), or None without Pillow."""
+    global _pil_modules
+    if _pil_modules is None:
+        try:
+            from PIL import Image, ImageOps  # type: ignore
+            _pil_modules = (Image, ImageOps)
+        except ImportError:  # Without Pillow originals are stored as-is (still hash-named)
+            _pil_modules = ()
+    return _pil_modules or None
+
+
+def _logos_root() -> str:
+    root = os.path.join(current_app.static_folder, *LOGO_DIR.split('/'))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def _write_once(path: str, data: bytes):
+    # Content-addressed: an existing file already holds identical bytes
+    if os.path.exists(path):
+        return
+    # Unique temp name: threads of one gthread worker may store the same logo concurrently
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; renditions are served as static files
+        os.replace(tmp, path)
+    except OSError:
+        # Lost the race to a writer of the same bytes (Windows cannot replace a file in use)
+        if not os.path.exists(path):
+            raise
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _render(img, max_side: int) -> bytes:
+    Image, _ = _pil()
+    im = img.copy()
+    im.thumbnail((max_side, max_side), Image.LANCZOS)
+    buf = io.BytesIO()
+    im.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+
+def store_logo(file_storage) -> str:
+    """Persist an uploaded logo and return the static-relative path of the default rendition.
+
+    Raises ValueError if the upload is not an accepted image.
+    """
+    ext = (file_storage.filename or '').rsplit('.', 1)[-1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError('Unsupported logo format. Use PNG, JPG, GIF or WEBP.')
+    data = file_storage.read()
+    if not data:
+        raise ValueError('Uploaded logo is empty.')
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    root = _logos_root()
+
+    pil = _pil()
+    if pil is None:
+        current_app.logger.warning('Pillow not installed; storing logo without resizing digest=%s', digest)
+        fname = f'{digest}.{ext}'
+        _write_once(os.path.join(root, fname), data)
+        return f'{LOGO_DIR}/{fname}'
+
+    Image, ImageOps = pil
+    try:
+        img = Image.open(io.BytesIO(data))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    except Exception as e:  # noqa: BLE001
+        raise ValueError('Uploaded logo could not be read as an image.') from e
+    for size, max_side in LOGO_SIZES.items():
+        _write_once(os.path.join(root, f'{digest}-{size}.png'), _render(img, max_side))
+    current_app.logger.info('Stored logo renditions digest=%s sizes=%s', digest, ','.join(LOGO_SIZES))
+    return f'{LOGO_DIR}/{digest}-{DEFAULT_SIZE}.png'
+
+
+def logo_rendition(logo_path: Optional[str], size: str) -> Optional[str]:
+    """Map a stored logo path to another rendition; legacy/unsized paths are returned unchanged."""
+    if not logo_path or size not in LOGO_SIZES:
+        return logo_path
+    suffix = f'-{DEFAULT_SIZE}.png'
+    if logo_path.startswith(LOGO_DIR + '/') and logo_path.endswith(suffix):
+        return logo_path[:-len(suffix)] + f'-{size}.png'
+    return logo_path
+
+
+def _build_data_uri(abs_path: str, max_side: int) -> str:
+    with open(abs_path, 'rb') as fh:
+        data = fh.read()
+    mime = mimetypes.guess_type(abs_path)[0] or 'application/octet-stream'
+    # Legacy uploads are stored full size; downscale before embedding when possible
+    pil = _pil()
+    if pil is not None and not os.path.basename(abs_path).endswith(tuple(f'-{s}.png' for s in LOGO_SIZES)):
+        try:
+            img = pil[0].open(io.BytesIO(data))
+            img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            data, mime = _render(img, max_side), 'image/png'
+        except Exception as e:  # noqa: BLE001
+            current_app.logger.debug('Logo downscale for inlining skipped path=%s err=%s', abs_path, e)
+    if len(data) > current_app.config.get('LOGO_INLINE_MAX_BYTES', 65536):
+        return ''
+    return f'data:{mime};base64,' + base64.b64encode(data).decode('ascii')
+
+
+def logo_data_uri(logo_path: Optional[str], size: str = DEFAULT_SIZE) -> Optional[str]:
+    """Base64 data URI for a stored logo, or None if missing / too large to inline.
+
+    Computed once per file version (path + mtime) and cached in memory and
+    under the instance folder so other workers and restarts reuse it.
+    """
+    if not logo_path:
+        return None
+    abs_path = os.path.join(current_app.static_folder, *logo_path.split('/'))
+    try:
+        mtime = os.stat(abs_path).st_mtime_ns
+    except OSError:
+        return None
+    key = (abs_path, mtime, size)
+    uri = _data_uri_cache.get(key)
+    if uri is None:
+        cache_dir = os.path.join(current_app.instance_path, DATA_URI_CACHE_DIR)
+        disk_name = hashlib.sha1(f'{abs_path}:{mtime}:{size}'.encode()).hexdigest() + '.txt'
+        disk_path = os.path.join(cache_dir, disk_name)
+        try:
+            with open(disk_path, 'r', encoding='ascii') as fh:
+                uri = fh.read()
+        except OSError:
+            uri = _build_data_uri(abs_path, LOGO_SIZES.get(size, LOGO_SIZES[DEFAULT_SIZE]))
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                _write_once(disk_path, uri.encode('ascii'))
+            except OSError as e:
+                current_app.logger.debug('Logo data URI disk cache write skipped err=%s', e)
+        with _data_uri_lock:
+            if len(_data_uri_cache) >= _DATA_URI_CACHE_MAX:
+                _data_uri_cache.clear()
+            _data_uri_cache[key] = uri
+    return uri or None
+
+
+def logo_url(profile, template_name: Optional[str] = None, inline: Optional[bool] = None) -> Optional[str]:
+    """URL (or inline data URI) of the profile logo rendition suited to the given invoice template."""
+    if not profile or not profile.logo_path:
+        return None
+    size = TEMPLATE_LOGO_SIZES.get(template_name, DEFAULT_SIZE)
+    path = logo_rendition(profile.logo_path, size)
+    if inline is None:
+        inline = current_app.config.get('LOGO_INLINE', False)
+    if inline:
+        uri = logo_data_uri(path, size)
+        if uri:
+            return uri
+    return url_for('static', filename=path)
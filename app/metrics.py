@@ -0,0 +1,134 @@
+"""Prometheus metrics for the hot paths, exposed at /metrics.
+
+With several worker processes set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory)
+before the app starts; each worker then writes its samples there and /metrics aggregates
+them. Without prometheus_client installed every metric is a no-op and /metrics returns 404.
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import Blueprint, Response, abort, current_app, request
+from werkzeug.exceptions import HTTPException
+try:
+    import prometheus_client as prom  # type: ignore
+    from prometheus_client import multiprocess  # type: ignore
+    from prometheus_client.core import GaugeMetricFamily  # type: ignore
+except ImportError:  # metrics disabled
+    prom = None  # type: ignore
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Request latencies: tens of ms (previews) up to gateway timeouts
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _histogram(name, doc, labels):
+    if prom is None:
+        return _NoopMetric()
+    return prom.Histogram(name, doc, labels, buckets=LATENCY_BUCKETS)
+
+
+def _counter(name, doc, labels):
+    if prom is None:
+        return _NoopMetric()
+    return prom.Counter(name, doc, labels)
+
+
+INVOICE_GENERATE_SECONDS = _histogram('brandvoice_invoice_generate_seconds', 'generate_post latency', ['mode', 'status'])
+INVOICE_PRINT_SECONDS = _histogram('brandvoice_invoice_print_seconds', 'print_invoice latency (304s included)', ['status'])
+WEBHOOK_SECONDS = _histogram('brandvoice_flutterwave_webhook_seconds', 'flutterwave_webhook latency', ['status'])
+WEBHOOK_VERIFY_SECONDS = _histogram('brandvoice_flutterwave_verify_seconds', 'Flutterwave verify call made by the webhook', ['outcome'])
+MAIL_SEND_SECONDS = _histogram('brandvoice_mail_send_seconds', 'safe_send_mail latency', ['category', 'result'])
+DAILY_JOB_SECONDS = _histogram('brandvoice_daily_job_seconds', 'Daily job run time', ['status'])
+DAILY_JOB_USERS = _counter('brandvoice_daily_job_users_total', 'Users processed by the daily job', ['action'])
+RATE_LIMITED = _counter('brandvoice_rate_limited_total', 'Requests rejected with 429 by app.ratelimit', ['limit', 'scope'])
+if prom is not None:
+    DAILY_JOB_LAST_SUCCESS = prom.Gauge('brandvoice_daily_job_last_success_timestamp', 'Unix time of the last successful daily job',
+                                        multiprocess_mode='max')
+else:
+    DAILY_JOB_LAST_SUCCESS = _NoopMetric()
+
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block; labels may be updated inside (e.g. outcome)."""
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - started)
+
+
+def timed_view(histogram, label_fn=None):
+    """Time a view into histogram labelled with the response status (plus label_fn())."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            labels = label_fn() if label_fn else {}
+            started = time.perf_counter()
+            status = '500'
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+                status = str(response.status_code)
+                return response
+            except HTTPException as e:  # abort(404) etc.
+                status = str(e.code)
+                raise
+            finally:
+                histogram.labels(status=status, **labels).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's live gauges (call from the process manager's child_exit hook)."""
+    if prom is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+def _queue_depth_text() -> bytes:
+    # Read at scrape time: the FailedEmail table is the mail retry queue
+    from .models import FailedEmail
+    registry = prom.CollectorRegistry()
+
+    class QueueDepth:
+        def collect(self):
+            family = GaugeMetricFamily('brandvoice_mail_queue_depth', 'Emails waiting in the FailedEmail retry queue')
+            family.add_metric([], FailedEmail.query.count())
+            yield family
+
+    registry.register(QueueDepth())
+    return prom.generate_latest(registry)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if prom is None or not token:
+        abort(404)
+    provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(provided.encode(), token.encode()):
+        return 'Forbidden', 403
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prom.REGISTRY
+    body = prom.generate_latest(registry) + _queue_depth_text()
+    return Response(body, content_type=prom.CONTENT_TYPE_LATEST)
@@ -1,8 +1,28 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import UserMixin
 from datetime import datetime, timedelta
+from .compression import compress_text, decompress_text
 
-db = SQLAlchemy()
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Sends reads to the replica bind while a view is marked read-only (see database.replica_reads).
+
+    Flushes (writes) always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_use_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -13,14 +33,25 @@ class User(UserMixin, db.Model):
     trial_start = db.Column(db.DateTime)  # set at registration
     is_premium = db.Column(db.Boolean, default=False)
     premium_expires_at = db.Column(db.DateTime)
+    # Denormalized access window end (trial end or premium expiry); NULL = no expiry.
+    # Kept in sync via refresh_access_expiry() so jobs can range-scan it in SQL.
+    access_expires_at = db.Column(db.DateTime)
     # Renewal reminder tracking (when last 1-day-before-expiry reminder was sent)
     last_renewal_reminder_sent_at = db.Column(db.DateTime)
-    # Password reset fields
-    password_reset_token = db.Column(db.String(255))
-    password_reset_sent_at = db.Column(db.DateTime)
     business_profile = db.relationship('BusinessProfile', backref='owner', uselist=False)
     invoices = db.relationship('Invoice', backref='user', lazy=True)
 
+    __table_args__ = (
+        # Partial index: the daily job's expiry scans only ever look at premium users (the
+        # predicates match how is_premium == True renders per dialect so the planners use it)
+        db.Index(
+            'ix_user_access_expires_at',
+            'access_expires_at',
+            postgresql_where=db.text('is_premium'),
+            sqlite_where=db.text('is_premium = 1'),
+        ),
+    )
+
     def trial_active(self) -> bool:
         if self.is_premium:
             return False  # premium overrides trial display
@@ -36,6 +67,17 @@ class User(UserMixin, db.Model):
             return datetime.utcnow() < self.premium_expires_at
         return self.trial_active()
 
+    def compute_access_expires_at(self):
+        """Return when access lapses: premium expiry if premium, else trial end."""
+        if self.is_premium:
+            return self.premium_expires_at
+        if self.trial_start:
+            return self.trial_start + timedelta(days=7)
+        return None
+
+    def refresh_access_expiry(self):
+        self.access_expires_at = self.compute_access_expires_at()
+
 class BusinessProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -45,6 +87,8 @@ class BusinessProfile(db.Model):
     email = db.Column(db.String(255))
     logo_path = db.Column(db.String(255))
     location = db.Column(db.String(50))  # 'Nigeria', 'United States', 'United Kingdom'
+    # Bumped on every edit; part of the invoice print/list cache validators
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -70,7 +114,15 @@ class Payment(db.Model):
     flw_transaction_id = db.Column(db.String(50))  # Flutterwave internal transaction ID
     verified_at = db.Column(db.DateTime)
     failure_reason = db.Column(db.String(255))
-    raw_meta = db.Column(db.Text)  # JSON snapshot (string) of verify payload or meta
+    raw_meta_z = db.Column(db.LargeBinary)  # compressed JSON snapshot of verify payload or meta
+
+    @property
+    def raw_meta(self):
+        return decompress_text(self.raw_meta_z)
+
+    @raw_meta.setter
+    def raw_meta(self, value):
+        self.raw_meta_z = compress_text(value)
 
 class Subscription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -87,6 +139,22 @@ class Subscription(db.Model):
     def is_active(self):
         return self.status == 'active' and datetime.utcnow() < self.current_period_end
 
+class InvoiceStat(db.Model):
+    """Running invoice count / total per user, by month and by client (see invoice_stats.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period = db.Column(db.String(7), nullable=False, default='')  # 'YYYY-MM'; '' = all time
+    client_key = db.Column(db.String(255), nullable=False, default='')  # normalized client name; '' = all clients
+    client_name = db.Column(db.String(255))  # as last written, for display
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    total_billed = db.Column(db.Float, nullable=False, default=0.0)
+    last_invoice_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Upsert target, and the dashboard's lookup (user_id first)
+        db.UniqueConstraint('user_id', 'period', 'client_key', name='uq_invoice_stat_user_period_client'),
+    )
+
 class InvoiceItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
@@ -117,5 +185,22 @@ class WebhookLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     tx_ref = db.Column(db.String(255), index=True)
     event = db.Column(db.String(100))
-    payload_json = db.Column(db.Text)  # raw JSON string
+    payload_json_z = db.Column(db.LargeBinary)  # compressed raw JSON body (see payload_json)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def payload_json(self):
+        return decompress_text(self.payload_json_z)
+
+    @payload_json.setter
+    def payload_json(self, value):
+        self.payload_json_z = compress_text(value)
+
+
+class PasswordResetToken(db.Model):
+    """Outstanding password reset link. Only the SHA-256 of the emailed token is stored."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # sweep range scan
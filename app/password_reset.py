@@ -0,0 +1,61 @@
+"""Single-use password reset tokens.
+
+The emailed token is 48 random bytes (urlsafe); the database keeps only its SHA-256, so a
+leaked table cannot be replayed. Lookup is an equality match on the unique token_hash
+index, and since the attacker-controlled input is hashed first, lookup timing reveals
+nothing about stored tokens. A user may hold several live tokens (e.g. repeated "forgot"
+requests); resetting the password deletes all of them. Expired rows are removed in
+batches by sweep_expired_reset_tokens() from the daily job.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from .models import db, PasswordResetToken
+
+RESET_EXP_MINUTES = 30
+
+
+def _hash(raw_token: str) -> str:
+    return hashlib.sha256(raw_token.encode('utf-8')).hexdigest()
+
+
+def issue_reset_token(user) -> str:
+    """Store a new token for user (caller commits) and return the raw value for the email link."""
+    raw = secrets.token_urlsafe(48)
+    now = datetime.utcnow()
+    db.session.add(PasswordResetToken(user_id=user.id, token_hash=_hash(raw), created_at=now,
+                                      expires_at=now + timedelta(minutes=RESET_EXP_MINUTES)))
+    return raw
+
+
+def find_reset_token(raw_token: str):
+    """The live token row for raw_token, or None if unknown or expired."""
+    if not raw_token:
+        return None
+    row = PasswordResetToken.query.filter_by(token_hash=_hash(raw_token)).first()
+    if row is None or row.expires_at <= datetime.utcnow():
+        return None
+    return row
+
+
+def consume_reset_tokens(row) -> bool:
+    """Use row: delete it and every other token of its user. False if a concurrent request used it first."""
+    used = PasswordResetToken.query.filter_by(id=row.id).delete(synchronize_session=False)
+    if not used:
+        return False
+    PasswordResetToken.query.filter_by(user_id=row.user_id).delete(synchronize_session=False)
+    return True
+
+
+def sweep_expired_reset_tokens(batch_size: int = 1000) -> int:
+    """Delete expired tokens batch by batch (short transactions); returns rows removed."""
+    now = datetime.utcnow()
+    removed = 0
+    while True:
+        ids = [r[0] for r in db.session.query(PasswordResetToken.id)
+               .filter(PasswordResetToken.expires_at <= now).limit(batch_size).all()]
+        if not ids:
+            return removed
+        PasswordResetToken.query.filter(PasswordResetToken.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        removed += len(ids)
@@ -0,0 +1,52 @@
+"""Password hashing policy (PASSWORD_HASH_METHOD) on top of werkzeug.security.
+
+Hashes are stored as "<method>$<salt>$<hash>", where method carries the cost parameters
+("scrypt:32768:8:1", "pbkdf2:sha256:600000"). A successful login whose stored method
+differs from the configured policy is rehashed with the current one, so raising or
+lowering the cost applies to users as they next sign in.
+"""
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'  # werkzeug's default scrypt cost (n=2**15, r=8, p=1)
+
+
+def normalize_method(method: str) -> str:
+    """Spell out werkzeug's implicit defaults: "scrypt" -> "scrypt:32768:8:1", "pbkdf2" -> "pbkdf2:sha256:<iter>"."""
+    name, *args = (method or DEFAULT_METHOD).split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f'Unsupported PASSWORD_HASH_METHOD {method!r} (use scrypt:N:r:p or pbkdf2:hash:iterations)')
+
+
+def current_method() -> str:
+    return normalize_method(current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD)
+
+
+def hash_password(password: str) -> str:
+    return generate_password_hash(password, method=current_method(),
+                                  salt_length=current_app.config.get('PASSWORD_SALT_LENGTH', 16))
+
+
+def verify_password(stored_hash: str, password: str) -> bool:
+    return bool(stored_hash) and check_password_hash(stored_hash, password)
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """True when stored_hash was made with a method/cost other than the current policy."""
+    stored_method = (stored_hash or '').split('$', 1)[0]
+    try:
+        return normalize_method(stored_method) != current_method()
+    except ValueError:  # legacy / unknown scheme
+        return True
+
+
+def init_app(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+    normalize_method(app.config['PASSWORD_HASH_METHOD'])  # reject a typo at startup
@@ -0,0 +1,256 @@
+"""Opt-in request profiler for production workers.
+
+Disabled unless PROFILING_TOKEN is set: no hooks are registered, so there is no overhead.
+When enabled, an authenticated POST to /debug/profile arms profiling of the next N requests
+to one endpoint, counted across all workers: the arm state is a small file under
+PROFILE_DIR that each worker re-reads only when it changes, and the remaining count in it
+is decremented under an flock, so N is the total however many workers there are. Each profiled request is written to
+PROFILE_DIR as either:
+
+- ``.prof``      cProfile stats (``python -m pstats`` / snakeviz), mode=cprofile
+- ``.collapsed`` sampled stacks, one ``frame;frame;frame count`` line per stack, ready
+                 for flamegraph.pl / speedscope, mode=sample
+
+Example:
+  curl -X POST -H "Authorization: Bearer $PROFILING_TOKEN" \\
+       -d endpoint=generate.generate_post -d count=20 -d mode=sample \\
+       https://host/debug/profile
+"""
+import cProfile
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from flask import Blueprint, abort, current_app, g, jsonify, request
+try:
+    import fcntl
+except ImportError:  # Windows: only the single-process dev server runs there
+    fcntl = None
+
+profiling_bp = Blueprint('profiling', __name__)
+
+MODES = ('cprofile', 'sample')
+ARM_FILE = 'armed.json'
+# Accepted ranges of the POST parameters: name -> (type, default, min, max)
+ARM_PARAMS = {
+    'count': (int, 10, 1, 1000),
+    'interval_ms': (float, 1.0, 0.1, 1000.0),
+    'ttl': (int, 900, 1, 3600),
+}
+
+# cProfile hooks the whole interpreter: only one Profile may be enabled at a time (on 3.12+
+# a second enable() raises ValueError), so under threaded workers concurrent requests
+# beyond the first are simply not profiled
+_cprofile_lock = threading.Lock()
+
+
+def _flock(fh, exclusive: bool):
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _wanted(cfg, endpoint: str) -> bool:
+    return (bool(cfg) and cfg.get('endpoint') == endpoint and cfg.get('remaining', 0) > 0
+            and time.time() <= cfg.get('expires_at', 0))
+
+
+class _ArmState:
+    """This worker's cached copy of the arm file; the remaining count lives in the file."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.config = None
+
+    def claim(self, profile_dir: str, endpoint: str):
+        """Return the arm config if this request should be profiled (and count it), else None."""
+        path = os.path.join(profile_dir, ARM_FILE)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # Re-arming replaces the file, so (inode, mtime) changes even within one mtime tick
+        version = (st.st_ino, st.st_mtime_ns)
+        with self.lock:
+            if version != self.version:
+                try:
+                    with open(path, encoding='utf-8') as fh:
+                        _flock(fh, exclusive=False)  # not mid-rewrite by another worker
+                        self.config = json.load(fh)
+                    self.version = version
+                except (OSError, ValueError):
+                    self.config = None
+            cfg = self.config
+        # Counts only go down until a re-arm replaces the file, so a stale cached copy can only
+        # let a request through to the locked check below, never wrongly skip one
+        if not _wanted(cfg, endpoint):
+            return None
+        try:
+            with open(path, 'r+', encoding='utf-8') as fh:
+                _flock(fh, exclusive=True)
+                cfg = json.load(fh)
+                if not _wanted(cfg, endpoint):
+                    return None
+                cfg['remaining'] -= 1
+                fh.seek(0)
+                fh.truncate()
+                json.dump(cfg, fh)
+        except (OSError, ValueError):
+            return None
+        return cfg
+
+
+_state = _ArmState()
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every `interval` seconds into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {n}\n' for stack, n in self.counts.most_common())
+
+
+def _authorized() -> bool:
+    token = current_app.config.get('PROFILING_TOKEN') or ''
+    provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return bool(token) and hmac.compare_digest(provided.encode(), token.encode())
+
+
+def _start_profile():
+    cfg = _state.claim(current_app.config['PROFILE_DIR'], request.endpoint)
+    if cfg is None:
+        return
+    if cfg.get('mode') == 'sample':
+        profiler = StackSampler(threading.get_ident(), cfg.get('interval_ms', 1) / 1000)
+        profiler.start()
+    else:
+        if not _cprofile_lock.acquire(blocking=False):
+            current_app.logger.info('Profile skipped endpoint=%s: another request is being profiled', request.endpoint)
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # another profiler (e.g. a debugger) owns the hook
+            _cprofile_lock.release()
+            current_app.logger.warning('Profile skipped endpoint=%s err=%s', request.endpoint, e)
+            return
+    g._profile = (cfg, profiler, time.perf_counter())
+
+
+def _finish_profile(exc=None):
+    entry = g.pop('_profile', None)
+    if entry is None:
+        return
+    cfg, profiler, started = entry
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    stem = os.path.join(current_app.config['PROFILE_DIR'],
+                        f"{request.endpoint}-{time.time_ns() // 1000}-{os.getpid()}-{int(elapsed_ms)}ms")
+    try:
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+            path = stem + '.collapsed'
+            with open(path, 'w', encoding='utf-8') as fh:
+                fh.write(profiler.collapsed())
+        else:
+            profiler.disable()
+            _cprofile_lock.release()
+            path = stem + '.prof'
+            profiler.dump_stats(path)
+        current_app.logger.info('Profile written endpoint=%s mode=%s elapsed_ms=%.1f path=%s',
+                                request.endpoint, cfg.get('mode'), elapsed_ms, path)
+    except OSError as e:
+        current_app.logger.warning('Profile dump failed endpoint=%s err=%s', request.endpoint, e)
+
+
+def _arm_params():
+    """Validated count / interval_ms / ttl from the request, or (None, error message)."""
+    values = {}
+    for name, (kind, default, lo, hi) in ARM_PARAMS.items():
+        if name not in request.values:
+            values[name] = default
+            continue
+        value = request.values.get(name, type=kind)
+        if value is None or not lo <= value <= hi:
+            return None, f'{name} must be a number between {lo} and {hi}'
+        values[name] = value
+    return values, None
+
+
+@profiling_bp.route('/debug/profile', methods=['GET', 'POST', 'DELETE'])
+def profile_control():
+    if not _authorized():
+        abort(404)
+    profile_dir = current_app.config['PROFILE_DIR']
+    arm_path = os.path.join(profile_dir, ARM_FILE)
+    if request.method == 'POST':
+        endpoint = request.values.get('endpoint', '')
+        mode = request.values.get('mode', 'cprofile')
+        if endpoint not in current_app.view_functions or mode not in MODES:
+            return jsonify({'error': 'unknown endpoint or mode', 'modes': MODES}), 400
+        params, error = _arm_params()
+        if error:
+            return jsonify({'error': error}), 400
+        cfg = {
+            'endpoint': endpoint,
+            'mode': mode,
+            'count': params['count'],
+            'remaining': params['count'],
+            'interval_ms': params['interval_ms'],
+            'expires_at': time.time() + params['ttl'],
+        }
+        tmp = arm_path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(cfg, fh)
+        os.replace(tmp, arm_path)
+        current_app.logger.info('Profiling armed %s', cfg)
+        return jsonify({'armed': cfg})
+    if request.method == 'DELETE':
+        try:
+            os.remove(arm_path)
+        except FileNotFoundError:
+            pass
+        return jsonify({'armed': None})
+    try:
+        with open(arm_path, encoding='utf-8') as fh:
+            armed = json.load(fh)
+    except (OSError, ValueError):
+        armed = None
+    dumps = sorted(f for f in os.listdir(profile_dir) if f.endswith(('.prof', '.collapsed')))
+    return jsonify({'armed': armed, 'profiles': dumps[-100:]})
+
+
+def init_app(app):
+    if not app.config.get('PROFILING_TOKEN'):
+        return
+    if not app.config.get('PROFILE_DIR'):
+        app.config['PROFILE_DIR'] = os.path.join(app.instance_path, 'profiles')
+    os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+    app.before_request(_start_profile)
+    app.teardown_request(_finish_profile)
+    app.register_blueprint(profiling_bp)
+    app.logger.warning('Request profiler enabled (PROFILE_DIR=%s)', app.config['PROFILE_DIR'])
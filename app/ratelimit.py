@@ -0,0 +1,191 @@
+"""Token-bucket rate limiting for expensive endpoints (invoice preview, login, register, reset mails).
+
+Limits are configured per name in RATE_LIMITS as "<count>/<second|minute|hour|day>" per
+scope: `ip` (client address), `user` (logged-in user id from the session, no DB lookup) or
+`ip_email` (client address plus the submitted form email). There is deliberately no scope
+keyed on the email alone: anyone could empty it and lock that account out of login or
+password reset. A bucket holds <count> tokens and refills continuously over the period;
+each request takes one. An empty bucket answers 429 with Retry-After
+before the view (and login_required) runs.
+
+Backends: RATE_LIMIT_STORAGE_URL=memory:// (default; per process, so each worker enforces
+its own buckets) or redis://host:port/db (shared by all workers; needs the `redis`
+package). Any object with a take(key, rate, capacity) -> (allowed, retry_after) method can
+be installed as app.extensions['ratelimit'] instead.
+"""
+import re
+import threading
+import time
+from functools import wraps
+from flask import Response, current_app, request, session
+from .metrics import RATE_LIMITED
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+
+def parse_limit(spec):
+    """Parse "10/minute" into (rate in tokens/s, capacity); None for empty/"off"."""
+    if not spec or str(spec).strip().lower() in {'0', 'off', 'none'}:
+        return None
+    m = LIMIT_RE.match(str(spec))
+    if not m:
+        raise ValueError(f'Invalid rate limit {spec!r}; expected e.g. "10/minute"')
+    count = int(m.group(1))
+    period = int(m.group(2) or 1) * PERIODS[m.group(3)]
+    return count / period, count
+
+
+class MemoryBackend:
+    """In-process buckets: {key: (tokens, updated_at, full_at)}; refilled buckets are pruned."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now):
+        # A bucket that has refilled completely carries no state
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                del self._buckets[key]
+        if len(self._buckets) > self.max_keys:  # still too many: drop the oldest half
+            oldest = sorted(self._buckets, key=lambda k: self._buckets[k][1])[:len(self._buckets) // 2]
+            for key in oldest:
+                del self._buckets[key]
+
+
+# Atomic refill + take on the Redis server clock; the hash expires once it would be full again
+_REDIS_TAKE = """
+local rate, capacity, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, retry = 0, 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {allowed, tostring(retry)}
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker, kept in Redis. Fails open if Redis is unreachable."""
+
+    def __init__(self, url: str, prefix: str = 'bv:rl:'):
+        import redis  # optional dependency, only needed for a shared backend
+        self._errors = (redis.RedisError,)
+        self.client = redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25)
+        self.prefix = prefix
+        self._take = self.client.register_script(_REDIS_TAKE)
+
+    def take(self, key, rate, capacity, cost=1):
+        try:
+            allowed, retry_after = self._take(keys=[self.prefix + key], args=[rate, capacity, cost])
+        except self._errors as e:
+            current_app.logger.warning('Rate limit backend unavailable, allowing request key=%s err=%s', key, e)
+            return True, 0.0
+        return bool(allowed), float(retry_after)
+
+
+def create_backend(url: str):
+    if not url or url.startswith('memory://'):
+        return MemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f'Unsupported RATE_LIMIT_STORAGE_URL {url!r}')
+
+
+def client_ip() -> str:
+    """Client address, trusting RATE_LIMIT_PROXY_HOPS X-Forwarded-For entries added by our proxies."""
+    hops = current_app.config.get('RATE_LIMIT_PROXY_HOPS', 0)
+    if hops:
+        forwarded = [p.strip() for p in request.headers.get('X-Forwarded-For', '').split(',') if p.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or 'unknown'
+
+
+def _scope_key(scope: str):
+    if scope == 'ip':
+        return client_ip()
+    if scope == 'user':
+        return session.get('_user_id')  # Flask-Login's session key; avoids loading the user
+    if scope == 'ip_email':
+        email = (request.form.get('email') or '').strip().lower()
+        return f'{client_ip()}|{email}' if email else None
+    raise ValueError(f'Unknown rate limit scope {scope!r}')
+
+
+def _too_many(retry_after: float):
+    resp = Response('Too many requests, please slow down.\n', 429, mimetype='text/plain')
+    resp.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return resp
+
+
+def check(name: str):
+    """Take a token from every configured bucket for name; returns a 429 response or None."""
+    if not current_app.config.get('RATE_LIMIT_ENABLED', True):
+        return None
+    limits = current_app.config.get('RATE_LIMITS', {}).get(name) or {}
+    backend = current_app.extensions['ratelimit']
+    for scope, spec in limits.items():
+        parsed = parse_limit(spec)
+        if parsed is None:
+            continue
+        ident = _scope_key(scope)
+        if ident is None:
+            continue
+        rate, capacity = parsed
+        allowed, retry_after = backend.take(f'{name}:{scope}:{ident}', rate, capacity)
+        if not allowed:
+            RATE_LIMITED.labels(limit=name, scope=scope).inc()
+            current_app.logger.debug('Rate limited name=%s scope=%s id=%s retry_after=%.1f', name, scope, ident, retry_after)
+            return _too_many(retry_after)
+    return None
+
+
+def rate_limited(name: str, methods=None, when=None):
+    """Apply the RATE_LIMITS[name] buckets to a view (only for methods / when when() is true)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (methods is None or request.method in methods) and (when is None or when()):
+                limited = check(name)
+                if limited is not None:
+                    return limited
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_STORAGE_URL', 'memory://')
+    app.config.setdefault('RATE_LIMIT_PROXY_HOPS', 0)
+    app.config.setdefault('RATE_LIMITS', {})
+    for name, limits in app.config['RATE_LIMITS'].items():
+        for spec in (limits or {}).values():
+            parse_limit(spec)  # fail at startup, not on the first limited request
+    app.extensions.setdefault('ratelimit', create_backend(app.config['RATE_LIMIT_STORAGE_URL']))
@@ -0,0 +1,253 @@
+"""Retention for the append-only audit tables: webhook_log, payment_callback_log, failed_email.
+
+RETENTION_DAYS maps each table to the age (days, by created_at) after which rows are
+purged; 0 / None keeps them forever. `flask purge-audit-logs` deletes expired rows in
+chunks of RETENTION_BATCH_SIZE, one short transaction per chunk, so neither SQLite's
+write lock nor Postgres row locks are held for long. With --archive-dir (or
+RETENTION_ARCHIVE_DIR) each chunk is first appended to <dir>/<table>-<YYYYMMDD>.jsonl.gz
+and fsynced; rows are only deleted once their archive is on disk.
+
+On Postgres, webhook_log and payment_callback_log are range-partitioned by month on
+created_at (migration partition_audit_logs; partitions are named <table>_pYYYYMM plus
+<table>_default). There, whole months older than the cutoff are archived and dropped
+instead of deleted row by row, and the command also creates partitions for the coming
+months so new rows never land in the default partition.
+
+Detaching needs an ACCESS EXCLUSIVE lock on the parent (DETACH ... CONCURRENTLY is not
+allowed while a default partition exists), which would block every insert queued behind
+it. So the DETACH runs alone in a short transaction with lock_timeout
+(RETENTION_LOCK_TIMEOUT_MS): if it cannot get the lock in time the month is skipped until
+the next run. The detached table is dropped in a separate transaction that no longer
+touches the parent, and tables left detached by an earlier failed DROP are dropped first.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from .compression import decompress_text
+from .models import db, WebhookLog, PaymentCallbackLog, FailedEmail
+
+RETENTION_MODELS = {
+    'webhook_log': WebhookLog,
+    'payment_callback_log': PaymentCallbackLog,
+    'failed_email': FailedEmail,
+}
+PARTITIONED_TABLES = ('webhook_log', 'payment_callback_log')
+
+
+def _archive_row(values: dict) -> dict:
+    """JSON-ready copy of a row: datetimes as ISO strings, compressed <name>_z columns decoded to <name>."""
+    out = {}
+    for name, value in values.items():
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, (bytes, memoryview)):
+            name, value = name.removesuffix('_z'), decompress_text(value)
+        out[name] = value
+    return out
+
+
+def _row_dict(row) -> dict:
+    return _archive_row({c.name: getattr(row, c.key) for c in row.__table__.columns})
+
+
+def _archive(archive_dir: str, table: str, rows) -> str:
+    """Append rows (dicts) to today's gzip JSONL file for table; returns its path."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'{table}-{datetime.utcnow():%Y%m%d}.jsonl.gz')
+    # Appending adds a gzip member; gzip/zcat read multi-member files as one stream
+    with gzip.open(path, 'at', encoding='utf-8') as fh:
+        for row in rows:
+            fh.write(json.dumps(row, default=str, separators=(',', ':')) + '\n')
+        fh.flush()
+        os.fsync(fh.fileno())
+    return path
+
+
+def purge_rows(table: str, cutoff: datetime, batch_size: int = 500, archive_dir=None, pause: float = 0.0,
+               dry_run: bool = False) -> int:
+    """Delete rows of table created before cutoff, batch by batch (oldest id first)."""
+    model = RETENTION_MODELS[table]
+    expired = model.query.filter(model.created_at < cutoff)
+    if dry_run:
+        return expired.count()
+    removed = 0
+    while True:
+        batch = expired.order_by(model.id).limit(batch_size).all()
+        if not batch:
+            return removed
+        if archive_dir:
+            _archive(archive_dir, table, [_row_dict(r) for r in batch])
+        ids = [r.id for r in batch]
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+        removed += len(ids)
+        if pause:
+            time.sleep(pause)  # let other writers in between chunks
+
+
+# --- Postgres monthly partitions -------------------------------------------------------
+
+def _month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def is_partitioned(table: str) -> bool:
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :t AND pg_table_is_visible(c.oid)"), {'t': table}).first() is not None
+
+
+def monthly_partitions(table: str) -> dict:
+    """{month start: partition name} for the <table>_pYYYYMM children of table."""
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:t AS regclass)"), {'t': table}).scalars()
+    out = {}
+    prefix = f'{table}_p'
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            out[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return out
+
+
+def ensure_partitions(table: str, months_ahead: int = 3) -> list:
+    """Create the monthly partitions from the current month through months_ahead ahead."""
+    existing = monthly_partitions(table)
+    created = []
+    month = _month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            name = f'{table}_p{month:%Y%m}'
+            try:
+                db.session.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"))
+                db.session.commit()
+                created.append(name)
+            except Exception as e:
+                # e.g. the default partition already holds rows for that month
+                db.session.rollback()
+                current_app.logger.warning('Could not create partition %s: %s', name, e)
+        month = _next_month(month)
+    return created
+
+
+def _detached_partitions(table: str) -> list:
+    """<table>_pYYYYMM tables that are no longer attached to table (a DROP failed after DETACH)."""
+    return db.session.execute(text(
+        "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname ~ :pattern "
+        "AND pg_table_is_visible(c.oid) AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"),
+        {'pattern': f'^{table}_p[0-9]{{6}}$'}).scalars().all()
+
+
+def _detach(table: str, name: str, lock_timeout_ms: int) -> bool:
+    """DETACH name from table in its own transaction; False if the parent's lock was not granted in time."""
+    try:
+        db.session.execute(text(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'"))
+        db.session.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+        db.session.commit()
+        return True
+    except OperationalError as e:
+        db.session.rollback()
+        current_app.logger.warning('Could not detach partition %s (retrying next run): %s', name, e)
+        return False
+
+
+def drop_expired_partitions(table: str, cutoff: datetime, archive_dir=None, batch_size: int = 500,
+                            dry_run: bool = False, lock_timeout_ms: int = 5000) -> int:
+    """Archive (optionally) and drop every monthly partition that ends before cutoff."""
+    model = RETENTION_MODELS[table]
+    removed = 0
+    if not dry_run:
+        for name in _detached_partitions(table):
+            db.session.execute(text(f'DROP TABLE "{name}"'))
+            db.session.commit()
+            current_app.logger.info('Dropped detached partition %s', name)
+    for month, name in sorted(monthly_partitions(table).items()):
+        if datetime.combine(_next_month(month), datetime.min.time()) > cutoff:
+            continue
+        count = db.session.execute(text(f'SELECT count(*) FROM "{name}"')).scalar()
+        if dry_run:
+            removed += count
+            continue
+        if archive_dir and count:
+            last_id = 0
+            columns = [c.name for c in model.__table__.columns]
+            while True:
+                rows = db.session.execute(text(
+                    f'SELECT {", ".join(columns)} FROM "{name}" WHERE id > :last ORDER BY id LIMIT :n'),
+                    {'last': last_id, 'n': batch_size}).mappings().all()
+                if not rows:
+                    break
+                _archive(archive_dir, table, [_archive_row(dict(r)) for r in rows])
+                last_id = rows[-1]['id']
+        if not _detach(table, name, lock_timeout_ms):
+            continue
+        db.session.execute(text(f'DROP TABLE "{name}"'))
+        db.session.commit()
+        current_app.logger.info('Dropped partition %s rows=%s', name, count)
+        removed += count
+    return removed
+
+
+def purge_table(table: str, days, batch_size: int = 500, archive_dir=None, pause: float = 0.0,
+                dry_run: bool = False) -> int:
+    """Apply the retention policy to one table; returns rows removed (or that would be)."""
+    if not days:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=int(days))
+    removed = 0
+    if not dry_run and table in PARTITIONED_TABLES and is_partitioned(table):
+        # (a dry run counts everything below, partitions included)
+        ensure_partitions(table, current_app.config.get('RETENTION_PARTITIONS_AHEAD', 3))
+        removed += drop_expired_partitions(table, cutoff, archive_dir, batch_size,
+                                           lock_timeout_ms=current_app.config.get('RETENTION_LOCK_TIMEOUT_MS', 5000))
+    # Row-wise for unpartitioned tables and for the remainder (straddling month / default partition)
+    removed += purge_rows(table, cutoff, batch_size, archive_dir, pause, dry_run)
+    return removed
+
+
+@click.command('purge-audit-logs')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(sorted(RETENTION_MODELS)),
+              help='Only these tables (default: all with a retention period).')
+@click.option('--days', type=int, help='Override the configured retention (days) for the selected tables.')
+@click.option('--batch-size', type=int, help='Rows per delete transaction (default RETENTION_BATCH_SIZE).')
+@click.option('--archive-dir', help='Append purged rows to gzip JSONL files here first (default RETENTION_ARCHIVE_DIR).')
+@click.option('--pause', type=float, default=0.0, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--dry-run', is_flag=True, help='Only count the rows that would be purged.')
+def purge_audit_logs_command(tables, days, batch_size, archive_dir, pause, dry_run):
+    """Delete audit rows older than their retention period (see app/retention.py)."""
+    cfg = current_app.config
+    policy = cfg.get('RETENTION_DAYS', {})
+    batch_size = batch_size or cfg.get('RETENTION_BATCH_SIZE', 500)
+    archive_dir = archive_dir or cfg.get('RETENTION_ARCHIVE_DIR')
+    for table in tables or sorted(RETENTION_MODELS):
+        keep = days if days is not None else policy.get(table)
+        started = time.perf_counter()
+        removed = purge_table(table, keep, batch_size, archive_dir, pause, dry_run)
+        verb = 'would purge' if dry_run else 'purged'
+        click.echo(f'{table}: {verb} {removed} rows (retention {keep or "forever"} days) '
+                   f'in {time.perf_counter() - started:.1f}s')
+
+
+def init_app(app):
+    app.config.setdefault('RETENTION_DAYS', {})
+    app.config.setdefault('RETENTION_BATCH_SIZE', 500)
+    app.config.setdefault('RETENTION_ARCHIVE_DIR', None)
+    app.config.setdefault('RETENTION_PARTITIONS_AHEAD', 3)
+    app.config.setdefault('RETENTION_LOCK_TIMEOUT_MS', 5000)
+    app.cli.add_command(purge_audit_logs_command)
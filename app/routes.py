@@ -1,11 +1,24 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify
 from flask_login import login_required, current_user
-from .models import db, Invoice, BusinessProfile, User, Payment
-from .subscription import extend_premium, user_can_modify_invoices, needs_renewal_reminder, mark_reminder_sent
+from .models import db, Invoice, BusinessProfile, User, Payment, WebhookLog, PaymentCallbackLog, Subscription
+from .subscription import extend_premium, ensure_subscription, user_can_modify_invoices, needs_renewal_reminder, mark_reminder_sent
+from .payments import Flutterwave
+from .utils_mail import safe_send_mail, retry_failed_emails
+from .logos import store_logo
+from .static_assets import asset_url
+from .http_cache import make_etag, template_version, not_modified, cacheable
+from .database import replica_reads
+from .password_reset import sweep_expired_reset_tokens
+from .invoice_stats import dashboard_stats
+from .metrics import timed, timed_view, WEBHOOK_SECONDS, WEBHOOK_VERIFY_SECONDS, DAILY_JOB_SECONDS, DAILY_JOB_USERS, DAILY_JOB_LAST_SUCCESS
+from sqlalchemy import func
 from datetime import datetime, timedelta
+from urllib.parse import urlparse, urlunparse, urlencode
+import json
+import re
 import uuid
-from werkzeug.utils import secure_filename
 import os
+import time
 
 main_bp = Blueprint('main', __name__)
 
@@ -15,15 +28,15 @@ def home():
 
 @main_bp.route('/dashboard')
 @login_required
+@replica_reads
 def dashboard():
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     trial_active = current_user.trial_active() if hasattr(current_user, 'trial_active') else False
     access_active = current_user.access_active() if hasattr(current_user, 'access_active') else False
     days_left = None
     if current_user.trial_start and not current_user.is_premium:
-        from datetime import datetime as _dt, timedelta as _td
-        end = current_user.trial_start + _td(days=7)
-        remaining = (end - _dt.utcnow()).days
+        end = current_user.trial_start + timedelta(days=7)
+        remaining = (end - datetime.utcnow()).days
         days_left = remaining if remaining > 0 else 0
     return render_template(
         'dashboard.html',
@@ -32,15 +45,27 @@ def dashboard():
         trial_active=trial_active,
         access_active=access_active,
         days_left=days_left,
+        stats=dashboard_stats(current_user.id),
     )
 
 @main_bp.route('/invoices')
 @login_required
+@replica_reads
 def invoices_list():
     # Gate access if neither trial nor premium
-    invoices = Invoice.query.filter_by(user_id=current_user.id).order_by(Invoice.created_at.desc()).all()
     can_modify = current_user.access_active()
-    return render_template('invoices_list.html', invoices=invoices, can_modify=can_modify)
+    # Invoices are append-only, so count + newest id/timestamp identify the list contents
+    count, last_id, newest = db.session.query(
+        func.count(Invoice.id), func.max(Invoice.id), func.max(Invoice.created_at)
+    ).filter(Invoice.user_id == current_user.id).one()
+    etag = make_etag('invoices', current_user.id, count, last_id, can_modify,
+                     template_version('invoices_list.html'), asset_url('app.css'))
+    cached = not_modified(etag, newest)
+    if cached is not None:
+        return cached
+    invoices = Invoice.query.filter_by(user_id=current_user.id).order_by(Invoice.created_at.desc()).all()
+    html = render_template('invoices_list.html', invoices=invoices, can_modify=can_modify)
+    return cacheable(html, etag, newest)
 
 
 @main_bp.route('/business-profile', methods=['GET', 'POST'])
@@ -56,12 +81,11 @@ def business_profile():
         location = request.form.get('location') or None
         logo_path_rel = profile.logo_path if profile else None
         if logo_file and logo_file.filename:
-            uploads_dir = os.path.join(current_app.static_folder, 'uploads')
-            os.makedirs(uploads_dir, exist_ok=True)
-            fname = secure_filename(logo_file.filename)
-            save_path = os.path.join(uploads_dir, fname)
-            logo_file.save(save_path)
-            logo_path_rel = f'uploads/{fname}'
+            try:
+                logo_path_rel = store_logo(logo_file)
+            except ValueError as e:
+                flash(str(e), 'error')
+                return render_template('business_profile.html', profile=profile)
 
         if not profile:
             profile = BusinessProfile(
@@ -89,17 +113,50 @@ def business_profile():
     return render_template('business_profile.html', profile=profile)
 
 
+def _db_phase(fn, *args):
+    """Run one DB phase of a gateway-calling view and end its transaction (commit, or roll back on error).
+
+    The pooled connection is returned before the view waits on Flutterwave, so a gthread
+    worker's threads do not each pin a connection for the length of the gateway call. Only plain
+    values (ids, dicts) are handed from one phase to the next: ORM instances are expired
+    by the commit.
+    """
+    try:
+        result = fn(*args)
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.commit()
+    return result
+
+
+# subscribe_pay and flutterwave_webhook block their worker thread on the Flutterwave call;
+# concurrency for them comes from GUNICORN_THREADS (see gunicorn.conf.py). The DB work is
+# split into _start/_finish phases around the call.
+
 @main_bp.route('/subscribe/pay')
 @login_required
 def subscribe_pay():
+    early, init = _db_phase(_subscribe_pay_start)
+    if early is not None:
+        return early
+    flw = Flutterwave(init['secret'], current_app.config.get('FLW_BASE_URL'))
+    try:
+        resp = flw.initialize_payment(**init['request'])
+    except Exception as e:
+        return _subscribe_pay_failed(init, e)
+    return _db_phase(_subscribe_pay_finish, init, resp)
+
+
+def _subscribe_pay_start():
+    """Validate the user and build the Flutterwave init call; returns (early_response, None) to stop."""
     if current_user.is_premium:
-        return redirect(url_for('main.dashboard'))
+        return redirect(url_for('main.dashboard')), None
     # Require business profile with location before payment
     bp = BusinessProfile.query.filter_by(user_id=current_user.id).first()
     if not bp or not bp.location:
         flash('Please complete your business profile (including location) before subscribing.', 'warning')
-        return redirect(url_for('main.business_profile'))
-    from .payments import Flutterwave
+        return redirect(url_for('main.business_profile')), None
     secret = (current_app.config.get('FLW_SECRET_KEY') or '').strip()
     # Defensive validation & logging
     def _mask(k: str):
@@ -111,7 +168,7 @@ def subscribe_pay():
     if not secret or secret.lower() in {'changeme','none'}:
         current_app.logger.error('Flutterwave key missing or placeholder. Value=%s', _mask(secret))
         flash('Payment gateway not configured.', 'error')
-        return redirect(url_for('main.dashboard'))
+        return redirect(url_for('main.dashboard')), None
     if not secret.startswith('FLWSECK_'):
         current_app.logger.warning('FLW secret does not start with expected prefix; proceeding anyway. Masked=%s', _mask(secret))
     # --- Pricing via business profile location ---
@@ -145,12 +202,10 @@ def subscribe_pay():
     requested_plan = (request.args.get('plan') or '').strip().lower() or None
     # tx_ref pattern: BV-{user_id}-{uuid}
     tx_ref = f"BV-{current_user.id}-{uuid.uuid4()}"
-    flw = Flutterwave(secret, current_app.config.get('FLW_BASE_URL'))
     redirect_url = url_for('main.payment_callback', _external=True)
     canonical = current_app.config.get('CANONICAL_DOMAIN')
     if canonical:
         try:
-            from urllib.parse import urlparse, urlunparse
             parts = urlparse(redirect_url)
             if parts.hostname in {'localhost', '127.0.0.1'} or (parts.hostname and parts.hostname.endswith('.onrender.com')):
                 # Force https for production canonical domain
@@ -161,13 +216,18 @@ def subscribe_pay():
 
     current_app.logger.info('Initializing FLW payment tx_ref=%s user_id=%s location=%s currency=%s amount=%s options=%s requested_plan=%s recurring=%s',
                             tx_ref, current_user.id, bp.location, currency, amount, payment_options, requested_plan, recurring)
-    try:
-        resp = flw.initialize_payment(
-            tx_ref,
-            f"{amount}",
-            currency,
-            redirect_url,
-            customer,
+    return None, {
+        'secret': secret,
+        'user_id': current_user.id,
+        'tx_ref': tx_ref,
+        'amount': amount,
+        'currency': currency,
+        'request': dict(
+            tx_ref=tx_ref,
+            amount=f"{amount}",
+            currency=currency,
+            redirect_url=redirect_url,
+            customer=customer,
             payment_options=payment_options,
             meta={
                 'user_id': current_user.id,
@@ -182,14 +242,20 @@ def subscribe_pay():
                 'logo': ''
             },
             payment_plan=str(plan_id) if plan_id else None,
-        )
-    except Exception as e:
-        current_app.logger.exception('FLW_INIT_ERROR tx_ref=%s currency=%s amount=%s user_id=%s err=%s', tx_ref, currency, amount, current_user.id, e)
-        flash('Could not reach payment gateway. Please try again shortly.', 'error')
-        return redirect(url_for('main.dashboard'))
+        ),
+    }
+
+
+def _subscribe_pay_failed(init, e):
+    current_app.logger.exception('FLW_INIT_ERROR tx_ref=%s currency=%s amount=%s user_id=%s err=%s',
+                                 init['tx_ref'], init['currency'], init['amount'], init['user_id'], e)
+    flash('Could not reach payment gateway. Please try again shortly.', 'error')
+    return redirect(url_for('main.dashboard'))
 
+
+def _subscribe_pay_finish(init, resp):
     # Persist provisional payment record
-    p = Payment(user_id=current_user.id, tx_ref=tx_ref, amount=amount, currency=currency, status='initiated')
+    p = Payment(user_id=init['user_id'], tx_ref=init['tx_ref'], amount=init['amount'], currency=init['currency'], status='initiated')
     db.session.add(p)
     db.session.commit()
 
@@ -214,9 +280,7 @@ def payment_callback():
         flash('Unknown transaction.', 'error')
         return redirect(url_for('main.dashboard'))
     # Log raw query string for traceability
-    from urllib.parse import urlencode
     raw_qs = urlencode({k: v for k, v in request.args.items()})
-    from .models import PaymentCallbackLog
     try:
         log = PaymentCallbackLog(payment_id=p.id, raw_query=raw_qs)
         db.session.add(log)
@@ -232,8 +296,24 @@ def payment_callback():
     return redirect(url_for('main.dashboard'))
 
 @main_bp.route('/webhook/flutterwave', methods=['POST'])
+@timed_view(WEBHOOK_SECONDS)
 def flutterwave_webhook():
-    from flask import jsonify
+    early, hook = _db_phase(_webhook_start)
+    if early is not None:
+        return early
+    verifier = Flutterwave(hook['secret'], current_app.config.get('FLW_BASE_URL'))
+    with timed(WEBHOOK_VERIFY_SECONDS, outcome='ok') as verify_labels:
+        try:
+            verify_resp = verifier.verify_transaction_by_ref(hook['tx_ref'])
+        except Exception as e:
+            verify_labels['outcome'] = 'error'
+            current_app.logger.exception('Transaction verify failed tx_ref=%s: %s', hook['tx_ref'], e)
+            return jsonify({'status': 'verify failed'}), 502
+    return _db_phase(_webhook_finish, hook, verify_resp)
+
+
+def _webhook_start():
+    """Authenticate, log and parse the webhook up to the verify call; returns (early_response, None) to stop."""
     # --- EARLY VISIBILITY LOGGING ---
     # Capture raw body & key request metadata BEFORE any branching so we can
     # see in Render / console logs that the webhook actually hit the server.
@@ -256,16 +336,15 @@ def flutterwave_webhook():
     expected = (current_app.config.get('FLW_HASH') or '').strip()
     if not expected:
         current_app.logger.error('Webhook received but FLW_HASH not set; rejecting for safety.')
-        return jsonify({'status': 'misconfigured'}), 500
+        return (jsonify({'status': 'misconfigured'}), 500), None
     if sig != expected:
         current_app.logger.warning('Rejected webhook invalid hash provided=%s (len=%s)', sig, len(sig) if sig else 0)
-        return jsonify({'status': 'invalid hash'}), 401
+        return (jsonify({'status': 'invalid hash'}), 401), None
     # Primary JSON parse (may fail if Content-Type not set correctly)
     payload = request.get_json(silent=True)
     parsed_via = 'request.get_json'
     if not payload:
         # Fallback manual parse
-        import json
         try:
             payload = json.loads(data_raw)
             parsed_via = 'json.loads'
@@ -280,7 +359,6 @@ def flutterwave_webhook():
     # Regex fallback for tx_ref if not found
     if not tx_ref and data_raw:
         try:
-            import re
             m = re.search(r'"tx_ref"\s*:\s*"([^"]+)"', data_raw)
             if m:
                 tx_ref = m.group(1)
@@ -290,15 +368,14 @@ def flutterwave_webhook():
 
     # Persist raw webhook log for auditing
     try:
-        from .models import WebhookLog
-        wl = WebhookLog(tx_ref=tx_ref, event=event, payload_json=data_raw[:5000])  # truncate to avoid oversized rows
+        wl = WebhookLog(tx_ref=tx_ref, event=event, payload_json=data_raw)  # stored compressed
         db.session.add(wl)
         db.session.commit()
     except Exception as e:  # noqa: BLE001
         current_app.logger.warning('Failed to persist WebhookLog tx_ref=%s err=%s', tx_ref, e)
     if not tx_ref:
         current_app.logger.info('Webhook missing tx_ref; parse_method=%s event=%s raw_snippet=%s', parsed_via, event, data_raw[:300])
-        return jsonify({'status': 'ignored', 'reason': 'no_tx_ref'}), 200
+        return (jsonify({'status': 'ignored', 'reason': 'no_tx_ref'}), 200), None
 
     payment = Payment.query.filter_by(tx_ref=tx_ref).first()
     if not payment:
@@ -326,26 +403,30 @@ def flutterwave_webhook():
             current_app.logger.info('Created stub payment for early webhook tx_ref=%s', tx_ref)
         except Exception:
             current_app.logger.warning('Webhook for unknown tx_ref=%s; failed stub create', tx_ref)
-            return jsonify({'status': 'ignored'}), 200
+            return (jsonify({'status': 'ignored'}), 200), None
 
     # Idempotency: if already successful & event signals success, short-circuit
     if payment.status == 'successful' and event in {'charge.completed', 'successful'}:
-        return jsonify({'status': 'ok'}), 200
+        return (jsonify({'status': 'ok'}), 200), None
 
     # Verify transaction with Flutterwave (server-side) for integrity
-    from .payments import Flutterwave
     secret = (current_app.config.get('FLW_SECRET_KEY') or '').strip()
     if not secret:
         current_app.logger.error('Missing FLW_SECRET_KEY during webhook verification.')
-        return jsonify({'status': 'misconfigured'}), 500
+        return (jsonify({'status': 'misconfigured'}), 500), None
+
+    return None, {'secret': secret, 'tx_ref': tx_ref, 'event': event, 'payment_id': payment.id,
+                  'payload': payload, 'flw_data': flw_data}
 
-    verifier = Flutterwave(secret, current_app.config.get('FLW_BASE_URL'))
-    try:
-        verify_resp = verifier.verify_transaction_by_ref(tx_ref)
-    except Exception as e:
-        current_app.logger.exception('Transaction verify failed tx_ref=%s: %s', tx_ref, e)
-        return jsonify({'status': 'verify failed'}), 502
 
+def _webhook_finish(hook, verify_resp):
+    """Apply the verified transaction to the payment (and the user's subscription)."""
+    tx_ref, event = hook['tx_ref'], hook['event']
+    payload, flw_data = hook['payload'], hook['flw_data']
+    payment = db.session.get(Payment, hook['payment_id'])
+    if payment is None:
+        current_app.logger.warning('Payment vanished during webhook verify tx_ref=%s', tx_ref)
+        return jsonify({'status': 'ignored'}), 200
     vdata = (verify_resp or {}).get('data') or {}
     v_status = (vdata.get('status') or '').lower()
     v_amount = vdata.get('amount')
@@ -386,14 +467,12 @@ def flutterwave_webhook():
             payment.verified_at = datetime.utcnow()
             # Store compact meta snapshot
             try:
-                import json
-                payment.raw_meta = json.dumps({'verify': vdata})[:8000]
+                payment.raw_meta = json.dumps({'verify': vdata})
             except Exception:
                 pass
             plan_code = (vdata.get('payment_plan') or vdata.get('paymentplan') or
                          payload.get('payment_plan') or flw_data.get('payment_plan'))
             if plan_code:
-                from .subscription import ensure_subscription
                 ensure_subscription(user, str(plan_code), payment.currency, tx_ref, days=30)
             else:
                 extend_premium(user, days=30)
@@ -412,36 +491,36 @@ def flutterwave_webhook():
     return jsonify({'status': 'pending'}), 200
 
 @main_bp.route('/jobs/daily')
+@timed_view(DAILY_JOB_SECONDS)
 def run_daily_jobs():
     # Simple unsecured endpoint (should protect with secret in production)
-    from .models import User, Subscription
     secret = request.args.get('secret')
     expected = current_app.config.get('CRON_SECRET')
     if expected and secret != expected:
         return 'Forbidden', 403
     now = datetime.utcnow()
-    from .utils_mail import safe_send_mail
     sent = 0
-    # 1. Downgrade expired users
-    expired_users = User.query.filter(User.is_premium == True, User.premium_expires_at != None, User.premium_expires_at <= now).all()  # noqa: E711
+    # 1. Downgrade expired users (range scan over indexed access_expires_at)
+    expired_users = User.query.filter(User.access_expires_at <= now, User.is_premium == True).all()  # noqa: E712
     for eu in expired_users:
         eu.is_premium = False
+        eu.refresh_access_expiry()
         current_app.logger.info('Downgraded expired user_id=%s premium_expires_at=%s', eu.id, eu.premium_expires_at)
 
-    # 2. Gather active subscriptions in <=3 day window
+    # 2. Premium users whose access ends within the next 3 days and who hold an active
+    #    subscription ending in that window (comped / manually extended premium is not reminded)
     window_end = now + timedelta(days=3)
-    subs = Subscription.query.filter(Subscription.status == 'active', Subscription.current_period_end > now, Subscription.current_period_end <= window_end).all()
-    processed_users = set()
-    for sub in subs:
-        user = User.query.get(sub.user_id)
-        if not user or user.id in processed_users:
-            continue
+    active_sub = Subscription.query.filter(
+        Subscription.user_id == User.id, Subscription.status == 'active',
+        Subscription.current_period_end > now, Subscription.current_period_end <= window_end,
+    ).exists()
+    expiring = User.query.filter(User.access_expires_at > now, User.access_expires_at <= window_end,
+                                 User.is_premium == True, active_sub).all()  # noqa: E712
+    for user in expiring:
         # Avoid spamming: send only if no reminder today
         if user.last_renewal_reminder_sent_at and user.last_renewal_reminder_sent_at.date() == now.date():
             continue
-        days_left = (sub.current_period_end - now).days
-        if days_left < 0:
-            continue
+        days_left = (user.access_expires_at - now).days
         body = f'Your BrandVoice subscription will expire in {days_left} day(s). Renew now to avoid interruption.'
         ok = safe_send_mail('Your BrandVoice subscription expires soon', [user.email], body, category='renewal_reminder')
         if ok:
@@ -449,10 +528,16 @@ def run_daily_jobs():
             sent += 1
         else:
             current_app.logger.warning('Queued (failed send) renewal reminder user_id=%s', user.id)
-        processed_users.add(user.id)
 
     db.session.commit()
-    return f'OK downgraded={len(expired_users)} reminders_sent={sent}'
+
+    # 3. Expired password reset tokens (batched deletes over the expires_at index)
+    swept = sweep_expired_reset_tokens()
+
+    DAILY_JOB_USERS.labels(action='downgraded').inc(len(expired_users))
+    DAILY_JOB_USERS.labels(action='reminded').inc(sent)
+    DAILY_JOB_LAST_SUCCESS.set(time.time())
+    return f'OK downgraded={len(expired_users)} reminders_sent={sent} reset_tokens_swept={swept}'
 
 @main_bp.route('/jobs/retry-emails')
 def retry_emails_job():
@@ -460,6 +545,5 @@ def retry_emails_job():
     expected = current_app.config.get('CRON_SECRET')
     if expected and secret != expected:
         return 'Forbidden', 403
-    from .utils_mail import retry_failed_emails
     processed = retry_failed_emails(limit=50)
     return f'OK retried={processed}'
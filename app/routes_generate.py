@@ -2,6 +2,14 @@ from flask import Blueprint, render_template, request, url_for, current_app, red
 from flask_login import login_required, current_user
 from .models import db, Invoice, BusinessProfile, InvoiceItem
 from .subscription import user_can_modify_invoices
+from .logos import logo_url
+from .static_assets import asset_url
+from .http_cache import make_etag, template_version, not_modified, cacheable
+from .database import replica_reads
+from .metrics import timed_view, INVOICE_GENERATE_SECONDS, INVOICE_PRINT_SECONDS
+from .ratelimit import rate_limited
+from .invoice_stats import record_invoice
+import re
 
 main_generate_bp = Blueprint('generate', __name__)
 
@@ -31,7 +39,9 @@ def generate_form():
 
 
 @main_generate_bp.route('/generate', methods=['POST'])
+@rate_limited('preview', when=lambda: request.form.get('preview') == 'true')
 @login_required
+@timed_view(INVOICE_GENERATE_SECONDS, lambda: {'mode': 'preview' if request.form.get('preview') == 'true' else 'finalize'})
 def generate_post():
     # from .utils import fmt_currency
     if request.method == 'POST':
@@ -72,9 +82,6 @@ def generate_post():
             })
             index += 1
 
-        # Logo comes from saved profile
-        brand_logo_url = url_for('static', filename=profile.logo_path) if profile.logo_path else None
-
         # Ensure numeric values and recompute subtotal and total for safety
         for it in items:
             price = float(it.get('price') or 0)
@@ -85,7 +92,6 @@ def generate_post():
         total_amount = round(sum(i['subtotal'] for i in items), 2)
 
         # Auto-generate invoice number with first two letters of business name + zero-padded sequence
-        import re
         name = (profile.business_name or '').strip()
         letters = re.sub(r'[^A-Za-z]', '', name).upper()
         prefix = (letters[:2] or 'IN')
@@ -99,6 +105,8 @@ def generate_post():
             "invoice_template_7.html"
         }
         chosen_template = template if template in allowed_templates else "invoice_template_1.html"
+        # Logo comes from saved profile (rendition sized for the chosen template)
+        brand_logo_url = logo_url(profile, chosen_template)
 
         # Prevent finalize if subscription/trial not active
         if not user_can_modify_invoices(current_user) and not is_preview:
@@ -127,6 +135,7 @@ def generate_post():
                     quantity=it['quantity'],
                     subtotal=it['subtotal'],
                 ))
+            record_invoice(inv)  # dashboard counters, same transaction as the invoice
             db.session.commit()
 
         html = render_template(
@@ -150,6 +159,8 @@ def generate_post():
 
 @main_generate_bp.route('/invoices/<int:invoice_id>/print')
 @login_required
+@replica_reads
+@timed_view(INVOICE_PRINT_SECONDS)
 def print_invoice(invoice_id: int):
     inv = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
     profile = BusinessProfile.query.filter_by(user_id=current_user.id).first()
@@ -157,8 +168,28 @@ def print_invoice(invoice_id: int):
         flash('Missing Business Profile for this account.', 'warning')
         return redirect(url_for('main.dashboard'))
 
+    # Use stored template_name for print view (persisted when finalized)
+    # Optional auto-print toggle via query param (?auto_print=1)
+    auto_print = str(request.args.get('auto_print', '')).lower() in {'1', 'true', 'yes'}
+
+    chosen_template = inv.template_name or 'invoice_template_1.html'
+    # If user cannot modify (expired) force read-only; disable auto_print and inject flag
+    can_modify = user_can_modify_invoices(current_user)
+    if not can_modify:
+        auto_print = False
+
+    # Finalized invoices are immutable: validate the client's copy before loading items / rendering
+    etag = make_etag('print', inv.id, profile.updated_at, profile.logo_path, chosen_template,
+                     template_version(chosen_template), asset_url('app.css'),
+                     current_app.config.get('LOGO_INLINE'), can_modify, auto_print)
+    stamps = [d for d in (inv.created_at, profile.updated_at) if d]
+    last_modified = max(stamps) if stamps else None
+    cached = not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+
     items = InvoiceItem.query.filter_by(invoice_id=inv.id).all()
-    brand_logo_url = url_for('static', filename=profile.logo_path) if profile.logo_path else None
+    brand_logo_url = logo_url(profile, chosen_template)
 
     # Reconstruct items list shape expected by templates
     item_dicts = [{
@@ -168,16 +199,6 @@ def print_invoice(invoice_id: int):
         'subtotal': it.subtotal,
     } for it in items]
 
-    # Use stored template_name for print view (persisted when finalized)
-    # Optional auto-print toggle via query param (?auto_print=1)
-    auto_print = str(request.args.get('auto_print', '')).lower() in {'1', 'true', 'yes'}
-
-    chosen_template = inv.template_name or 'invoice_template_1.html'
-    # If user cannot modify (expired) force read-only; disable auto_print and inject flag
-    from .subscription import user_can_modify_invoices
-    can_modify = user_can_modify_invoices(current_user)
-    if not can_modify:
-        auto_print = False
     html = render_template(
         chosen_template,
         business_name=profile.business_name,
@@ -195,4 +216,4 @@ def print_invoice(invoice_id: int):
         auto_print=auto_print,
         read_only=(not can_modify),
     )
-    return html
+    return cacheable(html, etag, last_modified)
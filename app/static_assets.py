@@ -0,0 +1,56 @@
+"""Template helpers for built static assets (see scripts/build_assets.py)."""
+import json
+import os
+from typing import Dict, Optional
+from flask import current_app, url_for
+from markupsafe import Markup
+
+TAILWIND_CDN = 'https://cdn.tailwindcss.com'
+MANIFEST_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'assets', 'manifest.json'))
+
+# Parsed manifest, reloaded only when the file changes (a new build)
+_manifest: Dict = {'mtime': None, 'entries': {}}
+
+
+def load_manifest() -> Dict[str, str]:
+    try:
+        mtime = os.stat(MANIFEST_PATH).st_mtime_ns
+    except OSError:
+        return {}
+    if _manifest['mtime'] != mtime:
+        try:
+            with open(MANIFEST_PATH, 'r', encoding='utf-8') as fh:
+                entries = json.load(fh)
+        except (OSError, ValueError) as e:
+            current_app.logger.error('Unreadable asset manifest %s: %s', MANIFEST_PATH, e)
+            return {}
+        _manifest.update(mtime=mtime, entries=entries)
+    return _manifest['entries']
+
+
+def asset_url(name: str) -> Optional[str]:
+    """Static URL of the built (content-hashed) file for a logical asset name."""
+    path = load_manifest().get(name)
+    return url_for('static', filename=path) if path else None
+
+
+def tailwind_css() -> Markup:
+    """Stylesheet tag for the built bundle; falls back to the Tailwind CDN when not built."""
+    href = asset_url('app.css')
+    if href:
+        return Markup('<link rel="stylesheet" href="{}">').format(href)
+    if current_app.config.get('TAILWIND_CDN_FALLBACK', True):
+        return Markup('<script src="{}"></script>').format(TAILWIND_CDN)
+    return Markup('')
+
+
+def init_app(app):
+    app.context_processor(lambda: {'tailwind_css': tailwind_css, 'asset_url': asset_url})
+    with app.app_context():
+        if load_manifest():
+            return
+        if not app.config.get('TAILWIND_CDN_FALLBACK', True):
+            # Without the bundle or the CDN every page would render unstyled
+            raise RuntimeError(f'CSS bundle not built ({MANIFEST_PATH} missing) and TAILWIND_CDN_FALLBACK is off; '
+                               'run scripts/build_assets.py')
+        app.logger.warning('CSS bundle not built; templates use %s (run scripts/build_assets.py)', TAILWIND_CDN)
@@ -16,6 +16,7 @@ def extend_premium(user, days: int = 30):
     base = user.premium_expires_at if user.premium_expires_at and user.premium_expires_at > now else now
     user.is_premium = True
     user.premium_expires_at = base + timedelta(days=days)
+    user.refresh_access_expiry()
     current_app.logger.info('Extended premium user_id=%s new_expiry=%s', user.id, user.premium_expires_at.isoformat())
 
 
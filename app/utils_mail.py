@@ -3,22 +3,52 @@ import socket
 from typing import List, Optional
 from flask import current_app
 from .models import db, FailedEmail
-try:
-    import mailtrap as mt  # type: ignore
-except ImportError:  # Provide a minimal stub so code paths still function (queueing only)
-    mt = None  # type: ignore
+from .instrumentation import external_call
+from .metrics import timed, MAIL_SEND_SECONDS
 from datetime import datetime
 
+_mailtrap_module = None
+
+
+def _mailtrap():
+    """The mailtrap SDK, imported when the first mail client is built (it is slow to import); None if missing."""
+    global _mailtrap_module
+    if _mailtrap_module is None:
+        try:
+            import mailtrap  # type: ignore
+            _mailtrap_module = mailtrap
+        except ImportError:  # Queueing only: failed sends are persisted as FailedEmail
+            _mailtrap_module = False
+    return _mailtrap_module or None
+
 # Network level errors we want to catch distinctly
 NETWORK_ERRORS = (socket.gaierror, OSError)
 
+class _HttpSendClient:
+    """Posts to a Mailtrap-compatible send endpoint directly (MAILTRAP_API_URL, e.g. the local stub)."""
+
+    def __init__(self, token: str, url: str):
+        self.token = token
+        self.url = url
+
+    def send(self, sender: dict, recipients: List[str], subject: str, text: str, category: str):
+        import requests  # deferred with the client: not needed at app startup
+        payload = {'from': sender, 'to': [{'email': r} for r in recipients], 'subject': subject, 'text': text, 'category': category}
+        resp = requests.post(self.url, json=payload, headers={'Authorization': f'Bearer {self.token}'}, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+
+
 class MailtrapEmailClient:
     def __init__(self, token: Optional[str] = None):
         self.token = token or os.environ.get('MAILTRAP_API_KEY')
         self._client = None
-        if self.token and mt is not None:
+        api_url = current_app.config.get('MAILTRAP_API_URL')
+        if self.token and api_url:
+            self._client = _HttpSendClient(self.token, api_url)
+        elif self.token and _mailtrap() is not None:
             try:
-                self._client = mt.MailtrapClient(token=self.token)
+                self._client = _mailtrap().MailtrapClient(token=self.token)
             except Exception as e:  # noqa: BLE001
                 current_app.logger.error('Failed to initialize Mailtrap client: %s', e)
         else:
@@ -39,6 +69,12 @@ class MailtrapEmailClient:
             email_addr = sender_email or 'support@brandvoice.live'
             name = sender_name
         try:
+            if isinstance(self._client, _HttpSendClient):
+                with external_call('mailtrap'):
+                    resp = self._client.send({'email': email_addr, 'name': name}, recipients, subject, text, category)
+                current_app.logger.info('Email success subject=%s to=%s resp_id=%s', subject, ','.join(recipients), resp.get('message_ids'))
+                return True
+            mt = _mailtrap()
             if mt is None:
                 raise RuntimeError('mailtrap library not installed')
             mail = mt.Mail(
@@ -48,7 +84,8 @@ class MailtrapEmailClient:
                 text=text,
                 category=category,
             )
-            resp = self._client.send(mail)  # type: ignore[attr-defined]
+            with external_call('mailtrap'):
+                resp = self._client.send(mail)  # type: ignore[attr-defined]
             current_app.logger.info('Email success subject=%s to=%s resp_id=%s', subject, ','.join(recipients), getattr(resp, 'message_ids', None))
             return True
         except NETWORK_ERRORS as e:
@@ -110,7 +147,10 @@ def get_mail_client() -> MailtrapEmailClient:
 
 def safe_send_mail(subject: str, recipients: List[str], body: str, category: str = 'transactional'):
     client = get_mail_client()
-    ok = client.send(subject, recipients, body, category=category)
+    with timed(MAIL_SEND_SECONDS, category=category, result='sent') as labels:
+        ok = client.send(subject, recipients, body, category=category)
+        if not ok:
+            labels['result'] = 'queued'
     if ok:
         current_app.logger.info('safe_send_mail dispatched subject=%s to=%s category=%s', subject, ','.join(recipients), category)
     else:
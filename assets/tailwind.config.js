@@ -0,0 +1,14 @@
+/** Tailwind build config for scripts/build_assets.py (purges against templates + inline HTML in routes). */
+module.exports = {
+  content: {
+    relative: true,
+    files: [
+      '../app/templates/**/*.html',
+      '../app/*.py',
+    ],
+  },
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark the invoice hot paths against a throwaway SQLite database.
+
+Usage (git-bash):
+  python benchmarks/bench_app.py                          # 10k invoices, 200 requests per scenario
+  python benchmarks/bench_app.py --invoices 100000 --out bench.json
+  python benchmarks/bench_app.py --only preview finalize --requests 500
+  python benchmarks/bench_app.py --out new.json --compare bench.json --max-regression 0.2
+
+The app is created with create_app() over a temporary SQLite file, seeded with synthetic
+users (the benchmark user owns --invoices invoices with 3 items each) and driven through
+Flask's test client, so the numbers cover routing, SQL and template rendering but not the
+network or WSGI server. Each scenario reports throughput and p50/p95/p99 latency.
+
+--compare exits with status 1 if any scenario's p95 is more than --max-regression slower
+than in the baseline JSON (e.g. the output of the previous commit).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('preview', 'finalize', 'invoices_list', 'print_invoice', 'print_invoice_304', 'daily_job')
+
+parser = argparse.ArgumentParser(description='Benchmark preview / finalize / list / print / daily job')
+parser.add_argument('--invoices', type=int, default=10000, help='Invoices owned by the benchmark user')
+parser.add_argument('--users', type=int, default=200, help='Other synthetic users (daily job population)')
+parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per scenario')
+parser.add_argument('--only', nargs='*', choices=SCENARIOS, help='Run only these scenarios')
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--keep-db', action='store_true', help='Keep the seeded SQLite file for inspection')
+parser.add_argument('--out', help='Write results JSON to this file')
+parser.add_argument('--compare', help='Baseline results JSON to compare against')
+parser.add_argument('--max-regression', type=float, default=0.2, help='Allowed p95 slowdown vs baseline (0.2 = 20%%)')
+
+# Expensive scenarios get fewer requests (a fraction of --requests)
+SCALE = {'invoices_list': 0.1, 'daily_job': 0.1}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, wall):
+    lat = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3)  # noqa: E731
+    return {
+        'requests': len(lat),
+        'throughput_rps': round(len(lat) / wall, 1) if wall else None,
+        'mean_ms': ms(sum(lat) / len(lat)),
+        'p50_ms': ms(percentile(lat, 50)),
+        'p95_ms': ms(percentile(lat, 95)),
+        'p99_ms': ms(percentile(lat, 99)),
+        'min_ms': ms(lat[0]),
+        'max_ms': ms(lat[-1]),
+    }
+
+
+def seed(db, models, n_invoices, n_users, rng):
+    """Insert users, one profile and n_invoices (x3 items) for the benchmark user; returns its id."""
+    from sqlalchemy import insert
+    User, BusinessProfile, Invoice, InvoiceItem = models
+    now = datetime.utcnow()
+    bench = User(email='bench@example.com', password_hash='x', is_premium=True,
+                 premium_expires_at=now + timedelta(days=365), trial_start=now - timedelta(days=30))
+    bench.refresh_access_expiry()
+    db.session.add(bench)
+    db.session.flush()
+    db.session.add(BusinessProfile(user_id=bench.id, business_name='Bench Studio', address='1 Test Road',
+                                   phone='000', email='bench@example.com'))
+    # Daily job population: a mix of expired, expiring-soon and healthy premium users
+    others = []
+    for i in range(n_users):
+        expires = now + timedelta(days=rng.choice((-2, 1, 2, 30)), hours=rng.randint(0, 23))
+        others.append({'email': f'user{i}@example.com', 'password_hash': 'x', 'is_premium': True,
+                       'premium_expires_at': expires, 'access_expires_at': expires, 'created_at': now})
+    if others:
+        db.session.execute(insert(User), others)
+
+    batch = 5000
+    for start in range(0, n_invoices, batch):
+        stop = min(start + batch, n_invoices)
+        rows = [{
+            'user_id': bench.id, 'invoice_number': f'BS{i + 1:06d}', 'client_name': f'Client {i % 97}',
+            'client_contact': 'client@example.com', 'payment_instructions': 'Bank 123', 'thanks_message': 'Thanks',
+            'total_amount': 300.0, 'template_name': f'invoice_template_{i % 3 + 1}.html',
+            'created_at': now - timedelta(minutes=n_invoices - i),
+        } for i in range(start, stop)]
+        ids = db.session.execute(insert(Invoice).returning(Invoice.id), rows).scalars().all()
+        db.session.execute(insert(InvoiceItem), [
+            {'invoice_id': inv_id, 'name': f'Item {k}', 'price': 100.0, 'quantity': 1, 'subtotal': 100.0}
+            for inv_id in ids for k in range(3)
+        ])
+    db.session.commit()
+    return bench.id
+
+
+def generate_form(preview: bool):
+    form = {'preview': 'true' if preview else 'false', 'client_name': 'Acme Ltd', 'client_contact': 'ap@acme.test',
+            'payment_instructions': 'Bank 123', 'thank_you_note': 'Thanks!', 'template': 'invoice_template_1.html'}
+    for i in range(5):
+        form[f'items[{i}][name]'] = f'Line {i}'
+        form[f'items[{i}][price]'] = '49.99'
+        form[f'items[{i}][quantity]'] = '2'
+        form[f'items[{i}][subtotal]'] = '99.98'
+    return form
+
+
+def build_requests(client, invoice_ids, rng, cron_secret):
+    """Scenario name -> zero-arg callable issuing one request and returning the response."""
+    preview_form, finalize_form = generate_form(True), generate_form(False)
+    etags = {}
+
+    def print_304():
+        inv_id = rng.choice(invoice_ids[:50])
+        headers = {'If-None-Match': etags[inv_id]} if inv_id in etags else {}
+        resp = client.get(f'/invoices/{inv_id}/print', headers=headers)
+        if resp.headers.get('ETag'):
+            etags[inv_id] = resp.headers['ETag']
+        return resp
+
+    return {
+        'preview': lambda: client.post('/generate', data=preview_form),
+        'finalize': lambda: client.post('/generate', data=finalize_form),
+        'invoices_list': lambda: client.get('/invoices'),
+        'print_invoice': lambda: client.get(f'/invoices/{rng.choice(invoice_ids)}/print'),
+        'print_invoice_304': print_304,
+        'daily_job': lambda: client.get('/jobs/daily', query_string={'secret': cron_secret}),
+    }
+
+
+def run_scenario(fn, n, warmup):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = fn()
+        latencies.append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            raise SystemExit(f'Request failed with {resp.status_code}: {resp.get_data(as_text=True)[:300]}')
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    with open(baseline_path, encoding='utf-8') as fh:
+        baseline = json.load(fh).get('results', {})
+    regressions = []
+    print(f"\n{'scenario':<20}{'base p95':>12}{'new p95':>12}{'change':>10}")
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('p95_ms'):
+            continue
+        change = res['p95_ms'] / base['p95_ms'] - 1
+        flag = '  REGRESSION' if change > max_regression else ''
+        print(f"{name:<20}{base['p95_ms']:>12.2f}{res['p95_ms']:>12.2f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    tmpdir = tempfile.mkdtemp(prefix='bv-bench-')
+    # Config reads the environment at import time: point everything at the scratch database
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ.setdefault('CRON_SECRET', 'bench')
+    os.environ['SLOW_REQUEST_MS'] = str(10 ** 9)
+    os.environ['RATE_LIMIT_ENABLED'] = '0'  # the scenarios replay one user's previews back to back
+    os.environ.pop('REPLICA_DATABASE_URL', None)
+    os.environ.pop('MAILTRAP_API_KEY', None)  # reminder mails are queued, never sent
+
+    from app import create_app
+    from app.models import db, User, BusinessProfile, Invoice, InvoiceItem
+
+    app = create_app()
+    app.logger.setLevel(logging.ERROR)
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db.create_all()
+        t0 = time.perf_counter()
+        user_id = seed(db, (User, BusinessProfile, Invoice, InvoiceItem), args.invoices, args.users, rng)
+        invoice_ids = [i for (i,) in db.session.query(Invoice.id).filter_by(user_id=user_id)]
+        print(f'Seeded {args.invoices} invoices + {args.users} users in {time.perf_counter() - t0:.1f}s ({tmpdir})')
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    requests_by_name = build_requests(client, invoice_ids, rng, app.config.get('CRON_SECRET'))
+
+    results = {}
+    for name in args.only or SCENARIOS:
+        n = max(5, int(args.requests * SCALE.get(name, 1)))
+        results[name] = run_scenario(requests_by_name[name], n, min(args.warmup, n))
+        r = results[name]
+        print(f"{name:<20} {r['throughput_rps']:>8} req/s  p50={r['p50_ms']:.2f}ms  p95={r['p95_ms']:.2f}ms  p99={r['p99_ms']:.2f}ms")
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    if not args.keep_db:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'git': git_revision(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'invoices': args.invoices,
+            'users': args.users,
+            'requests': args.requests,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        print(f'Wrote {args.out}')
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f'p95 regressions over {args.max_regression:.0%}: {regressions}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
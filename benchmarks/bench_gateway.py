@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Concurrent capacity of the gateway-bound routes (subscribe_pay, flutterwave_webhook) by
+threads per gthread worker.
+
+Usage (git-bash / Linux; needs gunicorn):
+  python benchmarks/bench_gateway.py                                # 500ms gateway, 2 workers x 1/4/16 threads, 50 clients
+  python benchmarks/bench_gateway.py --latency-ms 1000 --concurrency 100 --users 300
+  python benchmarks/bench_gateway.py --threads 16 32 --out gateway.json
+
+Starts scripts/stub_gateways.py with a fixed Flutterwave latency, then for each thread
+count runs gunicorn (wsgi:app) with `-k gthread --threads N` and the same worker count on
+a scratch SQLite database, and drives scripts/load_payments.py (register -> profile ->
+subscribe_pay -> callback -> webhook) against it. Every run uses the same worker class
+and the same sync views, so 1 thread is the baseline: a gateway call blocks its thread,
+and throughput is capped near workers x threads / latency.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+GATEWAY_STEPS = ('subscribe_pay', 'flutterwave_webhook')
+
+parser = argparse.ArgumentParser(description='gthread workers by thread count under simulated gateway latency')
+parser.add_argument('--latency-ms', type=float, default=500, help='Simulated Flutterwave latency')
+parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers for every run')
+parser.add_argument('--users', type=int, default=200, help='Virtual users (payment flows) per run')
+parser.add_argument('--concurrency', type=int, default=50, help='Virtual users in flight')
+parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help='Threads per worker, one run each')
+parser.add_argument('--out', help='Write results JSON to this file')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f'{url}: process exited with {proc.returncode}')
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'{url} did not become ready')
+
+
+def stop(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def run_setup(threads, args, env, tmpdir):
+    port = free_port()
+    kind = f'threads-{threads}'
+    db_env = dict(env, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, kind + '.db')}", GUNICORN_THREADS=str(threads))
+    subprocess.run([sys.executable, '-c', 'from app import create_app\nfrom app.models import db\n'
+                    'app = create_app()\nwith app.app_context(): db.create_all()'],
+                   cwd=ROOT, env=db_env, check=True, capture_output=True)
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+           '-k', 'gthread', '--threads', str(threads), '--access-logfile', '/dev/null', 'wsgi:app']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=db_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    report = os.path.join(tmpdir, kind + '.json')
+    try:
+        wait_ready(f'http://127.0.0.1:{port}/', proc)
+        subprocess.run([sys.executable, 'scripts/load_payments.py', '--base-url', f'http://127.0.0.1:{port}',
+                        '--users', str(args.users), '--concurrency', str(args.concurrency), '--json', report],
+                       cwd=ROOT, env=db_env, stdout=subprocess.DEVNULL)
+    finally:
+        stop(proc)
+    with open(report, encoding='utf-8') as fh:
+        data = json.load(fh)
+    return {'wall_s': data['wall_s'], **{step: data['steps'].get(step) for step in GATEWAY_STEPS}}
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    tmpdir = tempfile.mkdtemp(prefix='bv-gateway-')
+    stub_port = free_port()
+    stub = subprocess.Popen([sys.executable, 'scripts/stub_gateways.py', '--port', str(stub_port), '--quiet',
+                             '--latency-ms', str(args.latency_ms), '--jitter-ms', '0', '--mail-latency-ms', '0'],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'bench'), WEB_CONCURRENCY=str(args.workers),
+               SLOW_REQUEST_MS=str(10 ** 9), RATE_LIMIT_ENABLED='0', SERVER_TIMING='1',
+               TAILWIND_CDN_FALLBACK=os.environ.get('TAILWIND_CDN_FALLBACK', '1'),
+               FLW_BASE_URL=f'http://127.0.0.1:{stub_port}/v3', FLW_SECRET_KEY='FLWSECK_TEST-stub', FLW_HASH='stub-hash',
+               MAILTRAP_API_KEY='stub', MAILTRAP_API_URL=f'http://127.0.0.1:{stub_port}/api/send')
+    results = {}
+    try:
+        wait_ready(f'http://127.0.0.1:{stub_port}/stats', stub)
+        print(f'gateway latency {args.latency_ms:.0f}ms, {args.workers} gthread workers, {args.users} users, '
+              f'concurrency {args.concurrency}')
+        print(f"{'threads':<10}{'step':<22}{'rps':>8}{'p50':>9}{'p95':>9}{'err':>6}{'wall s':>9}")
+        for threads in args.threads:
+            results[threads] = r = run_setup(threads, args, env, tmpdir)
+            for step in GATEWAY_STEPS:
+                s = r[step] or {}
+                print(f"{threads:<10}{step:<22}{s.get('throughput_rps', '-'):>8}{s.get('p50_ms', '-'):>9}"
+                      f"{s.get('p95_ms', '-'):>9}{s.get('errors', '-'):>6}{r['wall_s']:>9}", flush=True)
+    finally:
+        stop(stub)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            json.dump({'latency_ms': args.latency_ms, 'workers': args.workers, 'threads': args.threads, 'users': args.users,
+                       'concurrency': args.concurrency, 'results': results}, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Login throughput per worker at each password hashing cost (PASSWORD_HASH_METHOD).
+
+Usage (git-bash):
+  python benchmarks/bench_passwords.py                                  # default cost ladder, 30 logins each
+  python benchmarks/bench_passwords.py --methods scrypt:16384:8:1 scrypt:32768:8:1 --logins 100
+  python benchmarks/bench_passwords.py --out passwords.json
+
+For every method a user is stored with that hash, then POST /auth/login runs --logins
+times in this process through Flask's test client (a single sync worker serving logins
+back to back). Reported: raw verify time, login p50/p95, logins/s per worker and, for
+scrypt, the memory each verification needs (128 * n * r * p bytes). Pick the highest
+cost whose logins/s x workers still covers peak login traffic.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+parser = argparse.ArgumentParser(description='Login throughput per password hash cost')
+parser.add_argument('--methods', nargs='*', default=[
+    'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000',
+    'scrypt:16384:8:1', 'scrypt:32768:8:1', 'scrypt:65536:8:1',
+])
+parser.add_argument('--logins', type=int, default=30, help='Measured logins per method')
+parser.add_argument('--out', help='Write results JSON to this file')
+
+
+def percentile(sorted_values, pct):
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def scrypt_memory_mb(method):
+    name, *args = method.split(':')
+    if name != 'scrypt':
+        return None
+    n, r, p = map(int, args)
+    return round(128 * n * r * p / 2 ** 20, 1)
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    tmpdir = tempfile.mkdtemp(prefix='bv-passwords-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ['RATE_LIMIT_ENABLED'] = '0'
+    os.environ['SLOW_REQUEST_MS'] = str(10 ** 9)
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    from app.models import db, User
+    from app.passwords import normalize_method, hash_password, verify_password
+
+    app = create_app()
+    app.logger.setLevel('WARNING')
+    with app.app_context():
+        db.create_all()
+
+    results = {}
+    print(f"{'method':<26}{'verify ms':>10}{'login p50':>11}{'login p95':>11}{'logins/s':>10}{'mem MB':>8}")
+    for raw in args.methods:
+        method = normalize_method(raw)
+        app.config['PASSWORD_HASH_METHOD'] = method
+        email, password = f'{method}@bench.test', 'correct horse battery staple'
+        with app.app_context():
+            stored = hash_password(password)
+            db.session.add(User(email=email, password_hash=stored))
+            db.session.commit()
+            verify = []
+            for _ in range(5):
+                t0 = time.perf_counter()
+                verify_password(stored, password)
+                verify.append((time.perf_counter() - t0) * 1000)
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(args.logins):
+            client = app.test_client()  # fresh cookie jar: every POST really authenticates
+            t0 = time.perf_counter()
+            resp = client.post('/auth/login', data={'email': email, 'password': password})
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code != 302:
+                raise SystemExit(f'login failed for {method}: HTTP {resp.status_code}')
+        wall = time.perf_counter() - started
+        lat = sorted(latencies)
+        results[method] = r = {
+            'verify_ms': round(statistics.median(verify), 1),
+            'login_p50_ms': round(percentile(lat, 50) * 1000, 1),
+            'login_p95_ms': round(percentile(lat, 95) * 1000, 1),
+            'logins_per_s_per_worker': round(args.logins / wall, 1),
+            'memory_mb': scrypt_memory_mb(method),
+        }
+        mem = '-' if r['memory_mb'] is None else r['memory_mb']
+        print(f"{method:<26}{r['verify_ms']:>10}{r['login_p50_ms']:>11}{r['login_p95_ms']:>11}"
+              f"{r['logins_per_s_per_worker']:>10}{mem:>8}", flush=True)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            json.dump({'logins': args.logins, 'results': results}, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
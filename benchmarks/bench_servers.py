@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Compare the Flask development server with the production Gunicorn setup.
+
+Usage (git-bash / Linux; Gunicorn does not run on native Windows):
+  python benchmarks/bench_servers.py                          # 20 clients, 10s per server
+  python benchmarks/bench_servers.py --concurrency 50 --duration 20 --workers 4
+  python benchmarks/bench_servers.py --paths / /auth/login --out servers.json
+
+Starts each server on a scratch SQLite database, waits until it answers, then drives
+GET requests from --concurrency client threads for --duration seconds and reports
+throughput, p50/p95/p99 latency and errors. The production run uses gunicorn.conf.py
+(preloaded app, forked workers) with WEB_CONCURRENCY=--workers.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+parser = argparse.ArgumentParser(description='Dev server vs Gunicorn throughput')
+parser.add_argument('--concurrency', type=int, default=20, help='Client threads')
+parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server')
+parser.add_argument('--workers', type=int, default=os.cpu_count() * 2 + 1, help='Gunicorn workers')
+parser.add_argument('--threads', type=int, default=1, help='Gunicorn threads per worker')
+parser.add_argument('--paths', nargs='*', default=['/', '/auth/login'], help='Paths requested round-robin')
+parser.add_argument('--only', choices=('dev', 'gunicorn'), help='Benchmark one server only')
+parser.add_argument('--out', help='Write results JSON to this file')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(kind, port, args):
+    if kind == 'dev':
+        return [sys.executable, '-c', f"from app import create_app; create_app().run(host='127.0.0.1', port={port})"]
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+            '--access-logfile', '/dev/null', 'wsgi:app']
+
+
+def wait_ready(port, proc, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f'server exited with {proc.returncode}')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('server did not become ready')
+
+
+def client(port, paths, stop_at):
+    latencies, errors = [], 0
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = 0
+    while time.time() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                errors += 1
+            if resp.will_close:
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        except OSError:
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+    return latencies, errors
+
+
+def percentile(sorted_values, pct):
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def bench(kind, args, env):
+    port = free_port()
+    proc = subprocess.Popen(server_command(kind, port, args), cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, proc)
+        started = time.time()
+        stop_at = started + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda _: client(port, args.paths, stop_at), range(args.concurrency)))
+        wall = time.time() - started
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    lat = sorted(x for r in results for x in r[0])
+    return {
+        'requests': len(lat),
+        'errors': sum(r[1] for r in results),
+        'throughput_rps': round(len(lat) / wall, 1),
+        'p50_ms': round(percentile(lat, 50) * 1000, 2),
+        'p95_ms': round(percentile(lat, 95) * 1000, 2),
+        'p99_ms': round(percentile(lat, 99) * 1000, 2),
+    }
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    tmpdir = tempfile.mkdtemp(prefix='bv-servers-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmpdir, 'bench.db')}",
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'bench'), WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_THREADS=str(args.threads), SLOW_REQUEST_MS=str(10 ** 9),
+               TAILWIND_CDN_FALLBACK=os.environ.get('TAILWIND_CDN_FALLBACK', '1'))  # no CSS build needed
+    subprocess.run([sys.executable, '-c', 'from app import create_app\nfrom app.models import db\n'
+                    'app = create_app()\nwith app.app_context(): db.create_all()'],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+    results = {}
+    for kind in ([args.only] if args.only else ['dev', 'gunicorn']):
+        results[kind] = r = bench(kind, args, env)
+        print(f"{kind:<9} {r['throughput_rps']:>8} req/s  p50={r['p50_ms']}ms  p95={r['p95_ms']}ms  "
+              f"p99={r['p99_ms']}ms  errors={r['errors']}  ({r['requests']} requests)", flush=True)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            json.dump({'concurrency': args.concurrency, 'duration_s': args.duration, 'workers': args.workers,
+                       'threads': args.threads, 'paths': args.paths, 'results': results}, fh, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start time of the app (import + create_app) in fresh interpreters.
+
+Usage (git-bash):
+  python benchmarks/bench_startup.py                       # 10 cold starts + import profile
+  python benchmarks/bench_startup.py --budget-ms 400       # exit 1 if the median exceeds 400ms
+  python benchmarks/bench_startup.py --runs 20 --out startup.json --compare base.json
+
+Every run is a new `python` process, so nothing is cached in sys.modules. One extra run
+uses `python -X importtime` to attribute import time to packages. Modules named in
+--forbid (heavy dependencies that must load lazily on first use) fail the check when they
+are imported during startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+parser = argparse.ArgumentParser(description='Cold start benchmark and import-time budget check')
+parser.add_argument('--runs', type=int, default=10)
+parser.add_argument('--budget-ms', type=float, help='Fail if the median import+create_app time exceeds this')
+parser.add_argument('--forbid', nargs='*', default=['alembic', 'flask_migrate', 'requests', 'PIL', 'mailtrap'],
+                    help='Top-level packages that must not be imported by create_app()')
+parser.add_argument('--top', type=int, default=15, help='Packages to list by import time')
+parser.add_argument('--out', help='Write results JSON to this file')
+parser.add_argument('--compare', help='Baseline JSON (from --out) to compare medians against')
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'create_ms': (t2 - t1) * 1000,
+                  'packages': sorted({m.split('.')[0] for m in sys.modules})}))
+"""
+
+
+def run_child(extra_args=()):
+    env = dict(os.environ, DATABASE_URL=os.environ.get('BENCH_DATABASE_URL', 'sqlite://'))
+    proc = subprocess.run([sys.executable, *extra_args, '-c', CHILD], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(stderr, top):
+    """Import self-time from -X importtime summed per top-level package, slowest first."""
+    per_package = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        per_package[package] = per_package.get(package, 0) + int(self_us)
+    rows = sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [{'package': p, 'self_ms': round(us / 1000, 1)} for p, us in rows]
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    samples = [run_child()[0] for _ in range(args.runs)]
+    totals = sorted(s['import_ms'] + s['create_ms'] for s in samples)
+    result = {
+        'runs': args.runs,
+        'median_ms': round(statistics.median(totals), 1),
+        'min_ms': round(totals[0], 1),
+        'max_ms': round(totals[-1], 1),
+        'median_import_ms': round(statistics.median(s['import_ms'] for s in samples), 1),
+        'median_create_app_ms': round(statistics.median(s['create_ms'] for s in samples), 1),
+    }
+    profile_sample, importtime = run_child(['-X', 'importtime'])
+    result['slowest_imports'] = slowest_imports(importtime, args.top)
+    result['forbidden_loaded'] = sorted(set(args.forbid) & set(profile_sample['packages']))
+
+    print(f"cold start (import + create_app): median {result['median_ms']}ms "
+          f"(import {result['median_import_ms']}ms, create_app {result['median_create_app_ms']}ms), "
+          f"min {result['min_ms']}ms, max {result['max_ms']}ms over {args.runs} runs")
+    print('import time by package:')
+    for row in result['slowest_imports']:
+        print(f"  {row['self_ms']:>8.1f}ms  {row['package']}")
+
+    failed = False
+    if result['forbidden_loaded']:
+        print(f"FAIL: imported at startup but should load lazily: {result['forbidden_loaded']}")
+        failed = True
+    if args.budget_ms is not None and result['median_ms'] > args.budget_ms:
+        print(f"FAIL: median {result['median_ms']}ms exceeds budget {args.budget_ms}ms")
+        failed = True
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fh:
+            base = json.load(fh)
+        change = result['median_ms'] / base['median_ms'] - 1
+        print(f"vs baseline: {base['median_ms']}ms -> {result['median_ms']}ms ({change:+.1%})")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fh:
+            json.dump(result, fh, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
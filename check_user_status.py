@@ -48,7 +48,7 @@ def verify_and_repair_user(user: User, app) -> tuple[int, int]:
                 from datetime import datetime as _dt
                 pay.verified_at = _dt.utcnow()
                 try:
-                    pay.raw_meta = json.dumps({'verify': data})[:8000]
+                    pay.raw_meta = json.dumps({'verify': data})
                 except Exception:
                     pass
                 extend_premium(user, days=30)
@@ -4,10 +4,100 @@ from dotenv import load_dotenv
 # Load .env at config import time (safe for dev/local)
 load_dotenv()
 
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name)
+    return int(raw) if raw not in (None, "") else default
+
+
+def engine_options(uri: str, read_only: bool = False) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI, tunable via DB_* env vars."""
+    if uri.startswith("sqlite"):
+        # Local file: no network hop to ping / recycle; tuning happens via SQLITE_PRAGMAS
+        return {}
+    opts = {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+    statement_timeout = _env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+    if uri.startswith("postgres"):
+        pg_options = [f"-c statement_timeout={statement_timeout}"] if statement_timeout else []
+        if read_only:
+            pg_options.append("-c default_transaction_read_only=on")
+        if pg_options:
+            opts["connect_args"] = {"options": " ".join(pg_options)}
+    return opts
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///brandvoice.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Optional read replica: views decorated with replica_reads query it instead of the primary
+    REPLICA_DATABASE_URL = os.environ.get("REPLICA_DATABASE_URL")
+    SQLALCHEMY_BINDS = {
+        "replica": {"url": REPLICA_DATABASE_URL, **engine_options(REPLICA_DATABASE_URL, read_only=True)},
+    } if REPLICA_DATABASE_URL else {}
+    # After a user's commit, keep their reads on the primary this long (read-your-writes)
+    REPLICA_STICKY_SECONDS = _env_int("REPLICA_STICKY_SECONDS", 5)
+    # Applied on every new SQLite connection (ignored for other databases)
+    SQLITE_PRAGMAS = {
+        "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "mmap_size": _env_int("SQLITE_MMAP_SIZE", 268435456),
+    }
+    # app.logger level outside debug mode (debug always logs DEBUG); goes to stderr / gunicorn's error log
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    # Request instrumentation: Server-Timing header and slow request log. The header exposes
+    # query counts and timings, so it is off by default; SERVER_TIMING=1 sends it on every
+    # response (local/staging), SERVER_TIMING_TOKEN only to requests sending that token in
+    # X-Server-Timing-Token
+    SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+    SERVER_TIMING_TOKEN = os.environ.get("SERVER_TIMING_TOKEN")
+    SLOW_REQUEST_MS = _env_int("SLOW_REQUEST_MS", 1000)
+    # Bearer token required by /metrics (endpoint disabled when unset)
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    # Bearer token enabling /debug/profile (profiler hooks are not installed when unset)
+    PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+    PROFILE_DIR = os.environ.get("PROFILE_DIR")  # default: instance/profiles
+    # Password hashing policy (werkzeug method string incl. cost); older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # Token-bucket rate limits ("<count>/<second|minute|hour|day>", "off" to disable) per
+    # client IP, logged-in user or (client IP, submitted email) pair; see app/ratelimit.py
+    RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMIT_STORAGE_URL = os.environ.get("RATE_LIMIT_STORAGE_URL", "memory://")  # redis://... to share across workers
+    RATE_LIMIT_PROXY_HOPS = _env_int("RATE_LIMIT_PROXY_HOPS", 0)  # trusted proxies appending X-Forwarded-For
+    RATE_LIMITS = {
+        "preview": {"ip": os.environ.get("RATE_LIMIT_PREVIEW_IP", "300/minute"),
+                    "user": os.environ.get("RATE_LIMIT_PREVIEW_USER", "120/minute")},
+        "login": {"ip": os.environ.get("RATE_LIMIT_LOGIN_IP", "20/minute"),
+                  "ip_email": os.environ.get("RATE_LIMIT_LOGIN_IP_EMAIL", "10/minute")},
+        "register": {"ip": os.environ.get("RATE_LIMIT_REGISTER_IP", "10/hour")},
+        "forgot_password": {"ip": os.environ.get("RATE_LIMIT_FORGOT_IP", "10/hour"),
+                            "ip_email": os.environ.get("RATE_LIMIT_FORGOT_IP_EMAIL", "3/hour")},
+    }
+
+    # Audit log retention in days (0 = keep forever), applied by `flask purge-audit-logs`
+    RETENTION_DAYS = {
+        "webhook_log": _env_int("WEBHOOK_LOG_RETENTION_DAYS", 90),
+        "payment_callback_log": _env_int("PAYMENT_CALLBACK_LOG_RETENTION_DAYS", 90),
+        "failed_email": _env_int("FAILED_EMAIL_RETENTION_DAYS", 30),
+    }
+    RETENTION_BATCH_SIZE = _env_int("RETENTION_BATCH_SIZE", 500)
+    RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR")  # gzip JSONL copies of purged rows
+    RETENTION_LOCK_TIMEOUT_MS = _env_int("RETENTION_LOCK_TIMEOUT_MS", 5000)  # Postgres: max wait to detach a partition
+    # Codec for new webhook payloads / verify snapshots: zlib, zstd (pip install zstandard) or none
+    PAYLOAD_COMPRESSION = os.environ.get("PAYLOAD_COMPRESSION", "zlib")
+    PAYLOAD_COMPRESSION_LEVEL = int(os.environ["PAYLOAD_COMPRESSION_LEVEL"]) if os.environ.get("PAYLOAD_COMPRESSION_LEVEL") else None
+    # `flask db-backup` snapshots (SQLite): destination (default <repo>/backups), how many to keep, gzip
+    BACKUP_DIR = os.environ.get("BACKUP_DIR")
+    BACKUP_KEEP = _env_int("BACKUP_KEEP", 14)
+    BACKUP_COMPRESS = os.environ.get("BACKUP_COMPRESS", "0") == "1"
 
     # Payment keys (set via env in production)
     PAYSTACK_SECRET_KEY = os.environ.get("PAYSTACK_SECRET_KEY")
@@ -15,14 +105,23 @@ class Config:
     FLW_HASH = os.environ.get("FLW_HASH")  # webhook verification hash
     # Base URL (allow override for sandbox if needed)
     FLW_BASE_URL = os.environ.get("FLW_BASE_URL", "https://api.flutterwave.com/v3")
+    # Override the Mailtrap send endpoint (e.g. scripts/stub_gateways.py for load tests); SDK used when unset
+    MAILTRAP_API_URL = os.environ.get("MAILTRAP_API_URL")
     # Optional recurring plan IDs by currency (Flutterwave payment_plan IDs)
     FLW_PLAN_USD = os.environ.get("FLW_PLAN_USD")
     FLW_PLAN_NGN = os.environ.get("FLW_PLAN_NGN")
     FLW_PLAN_GBP = os.environ.get("FLW_PLAN_GBP")
     CRON_SECRET = os.environ.get("CRON_SECRET")
+    # Embed the (downscaled) logo as a base64 data URI in invoice previews/prints
+    LOGO_INLINE = os.environ.get("LOGO_INLINE", "0") == "1"
+    LOGO_INLINE_MAX_BYTES = int(os.environ.get("LOGO_INLINE_MAX_BYTES", "65536"))
+    # Use the Tailwind CDN runtime when no CSS bundle has been built (dev convenience)
+    TAILWIND_CDN_FALLBACK = os.environ.get("TAILWIND_CDN_FALLBACK", "1") == "1"
 
 class DevConfig(Config):
     DEBUG = True
 
 class ProdConfig(Config):
     DEBUG = False
+    # Production serves the built bundle only; startup fails when it is missing
+    TAILWIND_CDN_FALLBACK = os.environ.get("TAILWIND_CDN_FALLBACK", "0") == "1"
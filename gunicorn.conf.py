@@ -0,0 +1,85 @@
+"""Gunicorn settings for production: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Tunable via env: PORT, WEB_CONCURRENCY (workers; default 2 x CPUs + 1, counting the
+container's cgroup CPU quota rather than the host's cores, capped by GUNICORN_MAX_WORKERS),
+GUNICORN_THREADS, GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS, PROMETHEUS_MULTIPROC_DIR
+(default /dev/shm/brandvoice-prometheus).
+
+subscribe_pay and flutterwave_webhook block their thread for the whole Flutterwave call,
+so gateway throughput is about workers x threads / gateway latency: raise GUNICORN_THREADS
+(gthread workers) for gateway-heavy traffic. Those views return their DB connection before
+calling out, so the pool need not grow with the thread count.
+
+Reloading: the app is preloaded in the master, so `kill -HUP <master>` restarts workers
+from the already-loaded code (config/env changes only). To deploy new code without
+dropping requests, start a new master with `kill -USR2 <master>`, then stop the old one
+with `kill -TERM <old master>` once the new workers are serving.
+"""
+import math
+import os
+import shutil
+import tempfile
+
+
+def available_cpus():
+    """CPUs this process may use: affinity mask, limited by a cgroup (v2 or v1) CPU quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as fh:
+            quota, period = fh.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as fq, open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as fp:
+                quota, period = fq.read().strip(), fp.read().strip()
+        except OSError:
+            return cpus
+    if quota in ('max', '-1'):
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# Each worker holds its own DB pool (DB_POOL_SIZE + DB_MAX_OVERFLOW connections, 15 by
+# default), so the cap keeps a many-core host from exhausting the database's connections
+_max_workers = int(os.environ.get('GUNICORN_MAX_WORKERS', '8'))
+workers = int(os.environ.get('WEB_CONCURRENCY') or min(available_cpus() * 2 + 1, _max_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))  # > the 30s gateway request timeout
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically (bounded memory growth), staggered so they do not restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = max_requests // 10
+# Heartbeat files on tmpfs so a slow disk cannot make healthy workers look hung
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+# Shared Prometheus sample directory, so /metrics aggregates every worker rather than only the
+# one serving the scrape. Set here because this file runs in the master before the app (and
+# prometheus_client, which reads the variable on import) is preloaded; cleared in on_starting.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(worker_tmp_dir or tempfile.gettempdir(), 'brandvoice-prometheus'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+accesslog = '-'
+errorlog = '-'
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+
+def on_starting(server):
+    # Prometheus multi-process samples from a previous run must not leak into this one
+    prom_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if prom_dir:
+        shutil.rmtree(prom_dir, ignore_errors=True)
+        os.makedirs(prom_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (if any) must not be shared with forked workers
+    from app.models import db
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from app.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
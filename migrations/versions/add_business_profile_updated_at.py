@@ -0,0 +1,23 @@
+"""Add updated_at to business_profile
+
+Revision ID: add_business_profile_updated_at
+Revises: add_user_access_expires_at
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_business_profile_updated_at'
+down_revision = 'add_user_access_expires_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('business_profile') as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('business_profile') as batch_op:
+        batch_op.drop_column('updated_at')
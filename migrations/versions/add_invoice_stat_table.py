@@ -0,0 +1,34 @@
+"""Add invoice_stat (per-user dashboard aggregates)
+
+Revision ID: add_invoice_stat_table
+Revises: compress_payload_columns
+Create Date: 2026-10-19
+
+Backfill after upgrading with `flask rebuild-invoice-stats`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_invoice_stat_table'
+down_revision = 'compress_payload_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'invoice_stat',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('period', sa.String(length=7), nullable=False, server_default=''),
+        sa.Column('client_key', sa.String(length=255), nullable=False, server_default=''),
+        sa.Column('client_name', sa.String(length=255), nullable=True),
+        sa.Column('invoice_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_billed', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('last_invoice_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('user_id', 'period', 'client_key', name='uq_invoice_stat_user_period_client'),
+    )
+
+
+def downgrade():
+    op.drop_table('invoice_stat')
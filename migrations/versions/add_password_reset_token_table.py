@@ -0,0 +1,73 @@
+"""Move password reset tokens to a hashed, indexed password_reset_token table
+
+Revision ID: add_password_reset_token_table
+Revises: add_business_profile_updated_at
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+from datetime import datetime, timedelta
+
+revision = 'add_password_reset_token_table'
+down_revision = 'add_business_profile_updated_at'
+branch_labels = None
+depends_on = None
+
+RESET_EXP_MINUTES = 30  # app.password_reset.RESET_EXP_MINUTES at the time of this migration
+
+
+def upgrade():
+    op.create_table(
+        'password_reset_token',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id'), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_password_reset_token_token_hash', 'password_reset_token', ['token_hash'], unique=True)
+    op.create_index('ix_password_reset_token_user_id', 'password_reset_token', ['user_id'])
+    op.create_index('ix_password_reset_token_expires_at', 'password_reset_token', ['expires_at'])
+
+    # Carry over links that are still valid, hashed; expired ones are simply dropped
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('password_reset_token', sa.String),
+        sa.column('password_reset_sent_at', sa.DateTime),
+    )
+    tokens = sa.table(
+        'password_reset_token',
+        sa.column('user_id', sa.Integer),
+        sa.column('token_hash', sa.String),
+        sa.column('created_at', sa.DateTime),
+        sa.column('expires_at', sa.DateTime),
+    )
+    bind = op.get_bind()
+    cutoff = datetime.utcnow() - timedelta(minutes=RESET_EXP_MINUTES)
+    rows = bind.execute(
+        sa.select(user.c.id, user.c.password_reset_token, user.c.password_reset_sent_at)
+        .where(user.c.password_reset_token.isnot(None), user.c.password_reset_sent_at > cutoff)
+    ).fetchall()
+    if rows:
+        bind.execute(tokens.insert(), [
+            {'user_id': uid, 'token_hash': hashlib.sha256(raw.encode('utf-8')).hexdigest(),
+             'created_at': sent_at, 'expires_at': sent_at + timedelta(minutes=RESET_EXP_MINUTES)}
+            for uid, raw, sent_at in rows
+        ])
+
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('password_reset_token')
+        batch_op.drop_column('password_reset_sent_at')
+
+
+def downgrade():
+    # Outstanding links are invalidated: only hashes were stored
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('password_reset_token', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('password_reset_sent_at', sa.DateTime(), nullable=True))
+    op.drop_index('ix_password_reset_token_expires_at', table_name='password_reset_token')
+    op.drop_index('ix_password_reset_token_user_id', table_name='password_reset_token')
+    op.drop_index('ix_password_reset_token_token_hash', table_name='password_reset_token')
+    op.drop_table('password_reset_token')
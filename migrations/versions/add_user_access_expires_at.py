@@ -0,0 +1,61 @@
+"""Add denormalized access_expires_at to user
+
+Revision ID: add_user_access_expires_at
+Revises: 63d93798c73e
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import timedelta
+
+revision = 'add_user_access_expires_at'
+down_revision = '63d93798c73e'
+branch_labels = None
+depends_on = None
+
+BATCH = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.add_column(sa.Column('access_expires_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_user_access_expires_at', 'user', ['access_expires_at'],
+        postgresql_where=sa.text('is_premium'),
+        sqlite_where=sa.text('is_premium = 1'),
+    )
+
+    # Backfill from existing premium/trial fields (same rule as User.compute_access_expires_at)
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('is_premium', sa.Boolean),
+        sa.column('premium_expires_at', sa.DateTime),
+        sa.column('trial_start', sa.DateTime),
+        sa.column('access_expires_at', sa.DateTime),
+    )
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(user.c.id, user.c.is_premium, user.c.premium_expires_at, user.c.trial_start)
+            .where(user.c.id > last_id).order_by(user.c.id).limit(BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        for uid, is_premium, premium_expires_at, trial_start in rows:
+            if is_premium:
+                expires = premium_expires_at
+            elif trial_start:
+                expires = trial_start + timedelta(days=7)
+            else:
+                expires = None
+            if expires is not None:
+                bind.execute(user.update().where(user.c.id == uid).values(access_expires_at=expires))
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    op.drop_index('ix_user_access_expires_at', table_name='user')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('access_expires_at')
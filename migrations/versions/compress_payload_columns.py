@@ -0,0 +1,103 @@
+"""Store webhook_log.payload_json and payment.raw_meta compressed (payload_json_z / raw_meta_z)
+
+Revision ID: compress_payload_columns
+Revises: partition_audit_logs
+Create Date: 2026-10-19
+
+Existing rows are converted BATCH_SIZE at a time with zlib and the text columns are dropped; the log lists rows converted and bytes before/after per
+table. SQLite only returns the freed pages to the OS after a VACUUM.
+"""
+from alembic import op
+import sqlalchemy as sa
+import logging
+import zlib
+
+revision = 'compress_payload_columns'
+down_revision = 'partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+COLUMNS = (('webhook_log', 'payload_json', 'payload_json_z'), ('payment', 'raw_meta', 'raw_meta_z'))
+
+log = logging.getLogger('alembic.runtime.migration')
+
+# Value format of app.compression at the time of this migration, kept here so the
+# migration does not change if that module does: MAGIC + codec byte + body, where the
+# codec is b'z' (zlib), b's' (zstd) or b'n' (stored); bytes without MAGIC are plain text
+MAGIC = b'BVZ1'
+COMPRESS_MIN_BYTES = 128
+ZLIB_LEVEL = 6
+
+
+def _encode(value):
+    raw = value.encode('utf-8')
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        body = zlib.compress(raw, ZLIB_LEVEL)
+        if len(body) < len(raw):
+            return MAGIC + b'z' + body
+    return MAGIC + b'n' + raw
+
+
+def _decode(blob):
+    blob = bytes(blob)
+    if not blob.startswith(MAGIC):
+        return blob.decode('utf-8', errors='replace')
+    codec, body = blob[4:5], blob[5:]
+    if codec == b'z':
+        body = zlib.decompress(body)
+    elif codec == b's':
+        # Written after this migration with PAYLOAD_COMPRESSION=zstd
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompress(body)
+    elif codec != b'n':
+        raise ValueError(f'Unknown compression codec {codec!r}')
+    return body.decode('utf-8')
+
+
+def _convert(table, source, target, encode, size):
+    """Rewrite table.source into table.target in id-ordered batches; returns (rows, bytes in, bytes out)."""
+    bind = op.get_bind()
+    t = sa.table(table, sa.column('id', sa.Integer), sa.column(source), sa.column(target))
+    update = t.update().where(t.c.id == sa.bindparam('_id')).values({target: sa.bindparam('_value')})
+    rows = before = after = 0
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(t.c.id, t.c[source]).where(t.c.id > last_id, t.c[source].isnot(None))
+            .order_by(t.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            return rows, before, after
+        params = [{'_id': row_id, '_value': encode(value)} for row_id, value in batch]
+        bind.execute(update, params)
+        rows += len(batch)
+        before += sum(size(value) for _, value in batch)
+        after += sum(size(p['_value']) for p in params)
+        last_id = batch[-1][0]
+
+
+def upgrade():
+    report = []
+    for table, text_col, blob_col in COLUMNS:
+        op.add_column(table, sa.Column(blob_col, sa.LargeBinary(), nullable=True))
+        rows, before, after = _convert(
+            table, text_col, blob_col,
+            encode=_encode,
+            size=lambda v: len(v.encode('utf-8')) if isinstance(v, str) else len(v),
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(text_col)
+        report.append((table, text_col, rows, before, after))
+    for table, column, rows, before, after in report:
+        saved = before - after
+        log.info('%s.%s: %s rows, %s -> %s bytes (saved %s, %.0f%%)', table, column, rows, before, after,
+                 saved, 100.0 * saved / before if before else 0.0)
+
+
+def downgrade():
+    for table, text_col, blob_col in COLUMNS:
+        op.add_column(table, sa.Column(text_col, sa.Text(), nullable=True))
+        _convert(table, blob_col, text_col, encode=_decode, size=len)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column(blob_col)
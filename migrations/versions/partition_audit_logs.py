@@ -0,0 +1,102 @@
+"""Partition webhook_log and payment_callback_log by month on Postgres
+
+Revision ID: partition_audit_logs
+Revises: add_password_reset_token_table
+Create Date: 2026-10-19
+
+Postgres only (no-op elsewhere). Each table is rebuilt as PARTITION BY RANGE (created_at)
+with monthly partitions <table>_pYYYYMM covering its existing rows through three months
+ahead, plus <table>_default; `flask purge-audit-logs` keeps creating upcoming months and
+drops expired ones (app/retention.py). The primary key becomes (id, created_at), as
+Postgres requires the partition key in unique constraints; id keeps its sequence.
+Existing rows are copied in one transaction: run during a quiet period on large tables.
+"""
+from alembic import op
+from datetime import date, datetime
+
+revision = 'partition_audit_logs'
+down_revision = 'add_password_reset_token_table'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+TABLES = {
+    'webhook_log': {
+        'columns': """
+            id integer NOT NULL,
+            tx_ref varchar(255),
+            event varchar(100),
+            payload_json text,
+            created_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP""",
+        'copy': 'id, tx_ref, event, payload_json, COALESCE(created_at, CURRENT_TIMESTAMP)',
+        'indexes': {'ix_webhook_log_tx_ref': 'tx_ref'},
+        'fks': {},
+    },
+    'payment_callback_log': {
+        'columns': """
+            id integer NOT NULL,
+            payment_id integer NOT NULL,
+            raw_query text,
+            created_at timestamp without time zone NOT NULL DEFAULT CURRENT_TIMESTAMP""",
+        'copy': 'id, payment_id, raw_query, COALESCE(created_at, CURRENT_TIMESTAMP)',
+        'indexes': {'ix_payment_callback_log_payment_id': 'payment_id'},
+        'fks': {'payment_callback_log_payment_id_fkey': ('payment_id', 'payment(id)')},
+    },
+}
+
+
+def _next_month(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _rebuild(table, spec, partitioned):
+    bind = op.get_bind()
+    new = f'{table}_rebuild'
+    seq = bind.exec_driver_sql(f"SELECT pg_get_serial_sequence('{table}', 'id')").scalar()
+    if partitioned:
+        op.execute(f'CREATE TABLE {new} ({spec["columns"]}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)')
+        oldest = bind.exec_driver_sql(f'SELECT min(created_at) FROM {table}').scalar() or datetime.utcnow()
+        month = date(oldest.year, oldest.month, 1)
+        today = datetime.utcnow().date()
+        last = date(today.year, today.month, 1)
+        for _ in range(MONTHS_AHEAD):
+            last = _next_month(last)
+        while month <= last:
+            op.execute(f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {new} "
+                       f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')")
+            month = _next_month(month)
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {new} DEFAULT')
+    else:
+        op.execute(f'CREATE TABLE {new} ({spec["columns"]}, PRIMARY KEY (id))')
+    op.execute(f'INSERT INTO {new} SELECT {spec["copy"]} FROM {table}')
+    if seq:
+        # Keep the id sequence alive when the old table (its owner) is dropped
+        op.execute(f'ALTER SEQUENCE {seq} OWNED BY NONE')
+    else:
+        seq = f'{table}_id_seq'
+        op.execute(f'CREATE SEQUENCE {seq}')
+        op.execute(f"SELECT setval('{seq}', COALESCE((SELECT max(id) FROM {new}), 0) + 1, false)")
+    op.execute(f"ALTER TABLE {new} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+    op.execute(f'DROP TABLE {table}')
+    op.execute(f'ALTER TABLE {new} RENAME TO {table}')
+    op.execute(f'ALTER INDEX {new}_pkey RENAME TO {table}_pkey')
+    op.execute(f'ALTER SEQUENCE {seq} OWNED BY {table}.id')
+    for name, column in spec['indexes'].items():
+        op.execute(f'CREATE INDEX {name} ON {table} ({column})')
+    for name, (column, target) in spec['fks'].items():
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {target}')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, spec in TABLES.items():
+        _rebuild(table, spec, partitioned=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, spec in TABLES.items():
+        _rebuild(table, spec, partitioned=False)
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Run database migrations - safe to run multiple times.
-This can be called during app startup or as a separate process.
+Run as a one-shot pre-deploy step, before the new release (gunicorn wsgi:app) starts serving.
 """
 import os
 import subprocess
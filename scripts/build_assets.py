@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Build the purged, minified Tailwind CSS bundle served from app/static/dist.
+
+The output file name carries a content hash (app.<hash>.css) so it can be cached
+forever; assets/manifest.json maps the logical name ('app.css') to the current file
+and is read by app.static_assets.tailwind_css() in templates.
+
+Usage:
+  python scripts/build_assets.py
+  python scripts/build_assets.py --tailwind ./tailwindcss-linux-x64   # standalone CLI binary
+  TAILWIND_BIN=./tailwindcss python scripts/build_assets.py --keep 3
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ASSETS_DIR = os.path.join(ROOT, 'assets')
+DIST_DIR = os.path.join(ROOT, 'app', 'static', 'dist')
+MANIFEST_PATH = os.path.join(ASSETS_DIR, 'manifest.json')
+TAILWIND_VERSION = '3.4.17'
+
+parser = argparse.ArgumentParser(description='Build content-hashed Tailwind CSS bundle')
+parser.add_argument('--tailwind', default=os.getenv('TAILWIND_BIN'), help='Path to tailwindcss CLI (default: PATH lookup, then npx)')
+parser.add_argument('--keep', type=int, default=2, help='Number of previous bundles to keep for rolling deploys')
+
+
+def tailwind_command(explicit):
+    if explicit:
+        return [explicit]
+    found = shutil.which('tailwindcss')
+    if found:
+        return [found]
+    if shutil.which('npx'):
+        return ['npx', '--yes', f'tailwindcss@{TAILWIND_VERSION}']
+    print('tailwindcss CLI not found. Install the standalone binary or Node.js, or pass --tailwind.')
+    raise SystemExit(2)
+
+
+def prune(current, keep):
+    bundles = [f for f in os.listdir(DIST_DIR) if f.startswith('app.') and f.endswith('.css') and f != current]
+    bundles.sort(key=lambda f: os.path.getmtime(os.path.join(DIST_DIR, f)), reverse=True)
+    for old in bundles[keep:]:
+        os.remove(os.path.join(DIST_DIR, old))
+        print(f'  removed old bundle {old}')
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    os.makedirs(DIST_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'app.css')
+        cmd = tailwind_command(args.tailwind) + [
+            '-c', os.path.join(ASSETS_DIR, 'tailwind.config.js'),
+            '-i', os.path.join(ASSETS_DIR, 'tailwind.css'),
+            '-o', out,
+            '--minify',
+        ]
+        print('Running:', ' '.join(cmd))
+        result = subprocess.run(cmd, cwd=ROOT)
+        if result.returncode != 0 or not os.path.exists(out):
+            print('Tailwind build failed.')
+            return 1
+        with open(out, 'rb') as fh:
+            css = fh.read()
+
+    digest = hashlib.sha256(css).hexdigest()[:12]
+    fname = f'app.{digest}.css'
+    target = os.path.join(DIST_DIR, fname)
+    if not os.path.exists(target):
+        with open(target, 'wb') as fh:
+            fh.write(css)
+    tmp_manifest = MANIFEST_PATH + '.tmp'
+    with open(tmp_manifest, 'w', encoding='utf-8') as fh:
+        json.dump({'app.css': f'dist/{fname}'}, fh, indent=2)
+    os.replace(tmp_manifest, MANIFEST_PATH)
+    print(f'Built dist/{fname} ({len(css) / 1024:.1f} KiB)')
+    prune(fname, args.keep)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
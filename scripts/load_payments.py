@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test of the payment flow against a running app + scripts/stub_gateways.py.
+
+Usage (git-bash):
+  python scripts/stub_gateways.py --quiet &
+  FLW_BASE_URL=http://127.0.0.1:8089/v3 FLW_SECRET_KEY=FLWSECK_TEST-stub FLW_HASH=stub-hash \\
+  MAILTRAP_API_KEY=stub MAILTRAP_API_URL=http://127.0.0.1:8089/api/send RATE_LIMIT_ENABLED=0 SERVER_TIMING=1 python app.py &
+  python scripts/load_payments.py --base-url http://127.0.0.1:8000 --users 200 --concurrency 20
+  python scripts/load_payments.py --users 100 --duplicate-webhooks 0.5 --mail --json load.json
+
+Each virtual user registers, saves a business profile, then runs
+  subscribe_pay -> payment_callback -> flutterwave_webhook (+ optional duplicate webhook)
+  [-> forgot password, to exercise mail sending, with --mail]
+Never point this at production: it creates real user rows.
+
+Reported per step: throughput, p50/p95/p99 latency, errors by status, and database time
+from the app's Server-Timing header (start the app with SERVER_TIMING=1, or pass its
+SERVER_TIMING_TOKEN with --timing-token). DB time growing with --concurrency while request
+count stays flat (or 5xx "database is locked" errors) indicates lock contention.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+from dotenv import load_dotenv
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import requests
+
+load_dotenv()
+
+parser = argparse.ArgumentParser(description='Load test subscribe_pay / payment_callback / flutterwave_webhook')
+parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Running app')
+parser.add_argument('--users', type=int, default=50, help='Virtual users (one full payment flow each)')
+parser.add_argument('--concurrency', type=int, default=10, help='Virtual users in flight at once')
+parser.add_argument('--flw-hash', default=os.getenv('FLW_HASH', 'stub-hash'), help='verif-hash sent with webhooks (app FLW_HASH)')
+parser.add_argument('--location', default='Nigeria', help='Business profile location (selects currency)')
+parser.add_argument('--duplicate-webhooks', type=float, default=0.0, help='Fraction of payments whose webhook is delivered twice')
+parser.add_argument('--mail', action='store_true', help='Also request a password reset per user (mail path)')
+parser.add_argument('--timing-token', default=os.getenv('SERVER_TIMING_TOKEN'), help='Sent as X-Server-Timing-Token (app SERVER_TIMING_TOKEN)')
+parser.add_argument('--json', help='Write the report to this file')
+
+SERVER_TIMING_DB = re.compile(r'(?:^|,)\s*db;dur=([\d.]+)')
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}  # step -> list of (seconds, status, db_ms)
+
+    def record(self, step, seconds, status, db_ms):
+        with self.lock:
+            self.samples.setdefault(step, []).append((seconds, status, db_ms))
+
+    def timed(self, step, fn):
+        t0 = time.perf_counter()
+        try:
+            resp = fn()
+        except requests.RequestException:
+            self.record(step, time.perf_counter() - t0, 'conn_error', None)
+            return None
+        m = SERVER_TIMING_DB.search(resp.headers.get('Server-Timing', ''))
+        self.record(step, time.perf_counter() - t0, resp.status_code, float(m.group(1)) if m else None)
+        return resp
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def virtual_user(base, args, rec, run_id, n):
+    s = requests.Session()
+    if args.timing_token:
+        s.headers['X-Server-Timing-Token'] = args.timing_token
+    email = f'load-{run_id}-{n}@example.test'
+    password = uuid.uuid4().hex
+    r = rec.timed('register', lambda: s.post(f'{base}/auth/register', data={'email': email, 'password': password}, allow_redirects=False))
+    if r is None or r.status_code != 302:
+        return
+    rec.timed('business_profile', lambda: s.post(f'{base}/business-profile', allow_redirects=False, data={
+        'business_name': f'Load Co {n}', 'address': '1 Load St', 'phone': '000', 'email': email, 'location': args.location}))
+
+    r = rec.timed('subscribe_pay', lambda: s.get(f'{base}/subscribe/pay', allow_redirects=False))
+    link = r.headers.get('Location', '') if r is not None else ''
+    tx_ref = (parse_qs(urlparse(link).query).get('tx_ref') or [None])[0]
+    if not tx_ref:
+        rec.record('subscribe_pay_no_link', 0.0, r.status_code if r is not None else 'conn_error', None)
+        return
+    rec.timed('payment_callback', lambda: s.get(f'{base}/payment/callback', allow_redirects=False,
+                                                params={'tx_ref': tx_ref, 'status': 'successful', 'transaction_id': n}))
+    webhook = {'event': 'charge.completed', 'data': {'tx_ref': tx_ref, 'status': 'successful'}}
+    deliveries = 2 if random.random() < args.duplicate_webhooks else 1
+    for _ in range(deliveries):
+        rec.timed('flutterwave_webhook', lambda: requests.post(f'{base}/webhook/flutterwave', json=webhook,
+                                                               headers={'verif-hash': args.flw_hash}, timeout=60))
+    if args.mail:
+        rec.timed('forgot_password', lambda: s.post(f'{base}/auth/forgot', data={'email': email}, allow_redirects=False))
+
+
+def report(rec, wall):
+    out = {}
+    for step, samples in rec.samples.items():
+        lat = sorted(x[0] for x in samples)
+        statuses = {}
+        for _, status, _ in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(v for k, v in statuses.items() if not k.isdigit() or int(k) >= 500)
+        db = sorted(x[2] for x in samples if x[2] is not None)
+        total_ms = sum(lat) * 1000
+        out[step] = {
+            'requests': len(samples),
+            'throughput_rps': round(len(samples) / wall, 1),
+            'p50_ms': round(percentile(lat, 50) * 1000, 1),
+            'p95_ms': round(percentile(lat, 95) * 1000, 1),
+            'p99_ms': round(percentile(lat, 99) * 1000, 1),
+            'errors': errors,
+            'statuses': statuses,
+            'db_p50_ms': round(percentile(db, 50), 1) if db else None,
+            'db_p95_ms': round(percentile(db, 95), 1) if db else None,
+            'db_share': round(sum(db) / total_ms, 3) if db and total_ms else None,
+        }
+    return out
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    base = args.base_url.rstrip('/')
+    rec = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda n: virtual_user(base, args, rec, run_id, n), range(args.users)))
+    wall = time.perf_counter() - started
+
+    steps = report(rec, wall)
+    print(f'{args.users} users, concurrency {args.concurrency}, {wall:.1f}s wall')
+    print(f"{'step':<22}{'n':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}{'db p95':>9}{'db %':>7}")
+    for step, r in steps.items():
+        db_p95 = f"{r['db_p95_ms']:.1f}" if r['db_p95_ms'] is not None else '-'
+        db_share = f"{r['db_share']:.0%}" if r['db_share'] is not None else '-'
+        print(f"{step:<22}{r['requests']:>6}{r['throughput_rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['errors']:>6}{db_p95:>9}{db_share:>7}")
+    try:
+        stub_stats = requests.get(urlparse(os.getenv('FLW_BASE_URL', 'http://127.0.0.1:8089/v3'))._replace(path='/stats').geturl(), timeout=5).json()
+        print(f"stub: {stub_stats.get('counts')}")
+    except (requests.RequestException, ValueError):
+        stub_stats = None
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump({'users': args.users, 'concurrency': args.concurrency, 'wall_s': round(wall, 2),
+                       'steps': steps, 'stub': stub_stats}, fh, indent=2)
+    return 1 if any(r['errors'] for r in steps.values()) else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
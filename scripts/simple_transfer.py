@@ -6,104 +6,146 @@ Faster and more robust than checking existence before each insert.
 Usage:
   python scripts/simple_transfer.py --dry-run
   python scripts/simple_transfer.py
+  python scripts/simple_transfer.py --workers 4   # independent tables in parallel
+  python scripts/simple_transfer.py --restart     # ignore the checkpoint of an earlier run
+
+Tables are scheduled from the foreign-key graph (parents before children); with
+--workers > 1 tables that do not depend on each other are copied concurrently.
+Rows are read in primary-key pages of --batch and the last copied key per table is
+recorded in instance/simple_transfer_checkpoint.json after every page, so an
+interrupted run resumes where it stopped (rows it re-sends are skipped as duplicates).
+The file is separate from sqlite_to_postgres.py's checkpoint so the two scripts never
+resume from each other's progress.
 """
 from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import IntegrityError
 from dotenv import load_dotenv
 import os
 import argparse
+import sys
+import threading
+
+# Importable however the script is invoked (repo root, scripts/ or elsewhere)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sqlite_to_postgres import Checkpoint, dependency_graph, keyset_pages, run_dependency_ordered  # noqa: E402
 
 load_dotenv()
 
 DEFAULT_SQLITE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'brandvoice.db'))
 SQLITE_URL = os.getenv('SQLITE_URL', f'sqlite:///{DEFAULT_SQLITE}')
 PG_URL = os.getenv('DATABASE_URL')
+DEFAULT_CHECKPOINT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'simple_transfer_checkpoint.json'))
 
 parser = argparse.ArgumentParser(description='Simple transfer from SQLite to Postgres')
 parser.add_argument('--dry-run', action='store_true', help='Just show counts, do not transfer')
+parser.add_argument('--workers', type=int, default=1, help='Tables copied concurrently (respecting foreign-key order)')
+parser.add_argument('--batch', type=int, default=1000, help='Rows read per primary-key page (checkpointed after each)')
+parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Checkpoint file recording progress per table')
+parser.add_argument('--restart', action='store_true', help='Ignore (and overwrite) an existing checkpoint')
 args = parser.parse_args()
 
+print_lock = threading.Lock()
+
+
+def log(msg):
+    with print_lock:
+        print(msg, flush=True)
+
+
 def main():
     if not PG_URL:
         print('No DATABASE_URL in .env')
         return
 
-    # Table order: parents first, children second
+    # Tables to copy; the order among them comes from foreign keys
     table_order = ['user', 'business_profile', 'invoice', 'invoice_item', 'payment', 'subscription', 'webhook_log', 'payment_callback_log', 'failed_email']
-    
+
     sqlite_engine = create_engine(SQLITE_URL)
     pg_engine = create_engine(PG_URL)
 
     # Get table metadata
     sqlite_meta = MetaData()
     sqlite_meta.reflect(bind=sqlite_engine)
-    
-    pg_meta = MetaData() 
-    pg_meta.reflect(bind=pg_engine)
 
-    total_transferred = 0
+    pg_meta = MetaData()
+    pg_meta.reflect(bind=pg_engine)
 
+    tables = []
     for table_name in table_order:
         if table_name not in sqlite_meta.tables:
             continue
         if table_name not in pg_meta.tables:
             print(f"Skipping {table_name} - not in PostgreSQL")
             continue
+        tables.append(table_name)
 
+    checkpoint = Checkpoint(None if args.dry_run else args.checkpoint, restart=args.restart)
+    run_id = {'source': SQLITE_URL, 'target': make_url(PG_URL).render_as_string(hide_password=True)}
+    previous = checkpoint.get('__run__')
+    if previous and {k: previous.get(k) for k in run_id} != run_id:
+        print(f'Checkpoint {args.checkpoint} belongs to a different run {previous}; pass --restart to discard it.')
+        return
+    checkpoint.update('__run__', **run_id)
+
+    def transfer(table_name):
         sqlite_table = sqlite_meta.tables[table_name]
         pg_table = pg_meta.tables[table_name]
-        
+
         # Count source rows
         with sqlite_engine.connect() as conn:
-            count = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
-        
-        print(f"{table_name}: {count} rows in source")
-        
+            count = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+
+        log(f"{table_name}: {count} rows in source")
+
+        state = checkpoint.get(table_name)
+        if state.get('done'):
+            log(f"  {table_name} -> already complete per checkpoint, skipping")
+            return 0
         if args.dry_run or count == 0:
-            continue
+            return 0
 
-        # Transfer all rows in one batch
-        with sqlite_engine.connect() as s_conn:
-            rows = s_conn.execute(text(f"SELECT * FROM {table_name}")).fetchall()
-        
-        if not rows:
-            continue
+        # Only real primary keys are resumable; no-PK tables re-run from the start
+        resumable = bool(sqlite_table.primary_key.columns)
+        start_after = tuple(state['last_key']) if resumable and state.get('last_key') else None
+        if start_after:
+            log(f"  {table_name} -> resuming after key {list(start_after)}")
+        inserted = state.get('inserted', 0) if start_after else 0
+        skipped = state.get('skipped', 0) if start_after else 0
 
-        # Convert to list of dicts
+        # Insert into PostgreSQL page by page, ignoring duplicates
+        with sqlite_engine.connect() as s_conn:
+            for rows, last_key in keyset_pages(s_conn, sqlite_table, args.batch, start_after=start_after):
+                for row_data in rows:
+                    try:
+                        with pg_engine.begin() as pg_conn:
+                            pg_conn.execute(pg_table.insert(), dict(row_data))
+                        inserted += 1
+                    except IntegrityError:
+                        skipped += 1  # Duplicate or constraint violation
+                    except Exception as e:
+                        log(f"Error inserting into {table_name}: {e}")
+                        skipped += 1
+                checkpoint.update(table_name, last_key=list(last_key) if resumable else None,
+                                  inserted=inserted, skipped=skipped, done=False)
+
+        log(f"  {table_name} -> Inserted: {inserted}, Skipped: {skipped}")
         column_names = [col.name for col in sqlite_table.columns]
-        data = []
-        for row in rows:
-            row_dict = dict(zip(column_names, row))
-            data.append(row_dict)
-
-        # Insert into PostgreSQL, ignoring duplicates
-        inserted = 0
-        skipped = 0
-        
-        for row_data in data:
-            try:
-                with pg_engine.begin() as pg_conn:
-                    pg_conn.execute(pg_table.insert(), row_data)
-                inserted += 1
-            except IntegrityError:
-                skipped += 1  # Duplicate or constraint violation
-            except Exception as e:
-                print(f"Error inserting into {table_name}: {e}")
-                skipped += 1
-
-        print(f"  -> Inserted: {inserted}, Skipped: {skipped}")
-        total_transferred += inserted
 
         # Fix sequence if the table has an id column
         if 'id' in column_names:
             try:
                 with pg_engine.begin() as pg_conn:
-                    pg_conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), (SELECT COALESCE(MAX(id),0) FROM {table_name}))"))
-                print(f"  -> Fixed sequence for {table_name}")
+                    pg_conn.execute(text(f"""SELECT setval(pg_get_serial_sequence('"{table_name}"', 'id'), (SELECT COALESCE(MAX(id),0) FROM "{table_name}"))"""))
+                log(f"  {table_name} -> Fixed sequence")
             except Exception as e:
-                print(f"  -> Could not fix sequence for {table_name}: {e}")
+                log(f"  {table_name} -> Could not fix sequence: {e}")
+        checkpoint.update(table_name, done=True)
+        return inserted
+
+    results = run_dependency_ordered(tables, dependency_graph(sqlite_meta, tables), transfer, workers=args.workers)
+    print(f"\nTotal transferred: {sum(results.values())} rows")
 
-    print(f"\nTotal transferred: {total_transferred} rows")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -3,25 +3,39 @@
 Resumable SQLite -> PostgreSQL transfer script.
 
 Usage examples (git-bash):
-  # dry-run 10 rows
-  python scripts/sqlite_to_postgres.py --dry-run --limit 10
+  # dry-run: show source row counts only
+  python scripts/sqlite_to_postgres.py --dry-run
 
   # actual run
   python scripts/sqlite_to_postgres.py
 
-This script will attempt to import rows table-by-table using SQLAlchemy Core for portability.
-It prefers to use your app models if available (imports `app.models`), but will fall back to
-reflecting table metadata when necessary.
+  # rehearse against a scratch SQLite target instead of Postgres
+  python scripts/sqlite_to_postgres.py --pg sqlite:///instance/rehearsal.db
 
-It is intentionally conservative: it checks for existing primary keys and skips inserts that
-would collide. It also runs `setval` on sequences where appropriate.
+  # copy independent tables concurrently (4 workers); resumes from the checkpoint if interrupted
+  python scripts/sqlite_to_postgres.py --workers 4
+
+Both schemas are reflected once. Each table is read in primary-key order using keyset
+paging (WHERE pk > last_pk ORDER BY pk LIMIT n), and every page is written with a single
+multi-row INSERT ... ON CONFLICT DO NOTHING. Rows that already exist in the target are
+skipped by the database instead of by per-row existence checks, so re-running is safe.
+The target schema must already exist (run migrations first). Sequences are bumped with
+setval afterwards on Postgres.
+
+Tables are scheduled from the foreign-key graph of the reflected schema: a table starts as
+soon as every table it references has finished, so with --workers > 1 independent tables
+(e.g. webhook_log, failed_email) copy alongside invoice. After every page the last copied
+key per table is written to a checkpoint file; an interrupted run picks up from there.
 """
-from sqlalchemy import create_engine, MetaData, Table, select, insert, text
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import create_engine, MetaData, select, func, tuple_, text
+from sqlalchemy.engine import make_url
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 import os
 import argparse
+import json
 import sys
+import threading
 import time
 
 load_dotenv()
@@ -29,20 +43,19 @@ load_dotenv()
 DEFAULT_SQLITE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'brandvoice.db'))
 SQLITE_URL = os.getenv('SQLITE_URL', f'sqlite:///{DEFAULT_SQLITE}')
 PG_URL = os.getenv('DATABASE_URL')
+DEFAULT_CHECKPOINT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'instance', 'transfer_checkpoint.json'))
 
 parser = argparse.ArgumentParser(description='Transfer data from SQLite to Postgres')
 parser.add_argument('--sqlite', default=SQLITE_URL, help='SQLite URL (file:// or sqlite:///path)')
-parser.add_argument('--pg', default=PG_URL, help='Postgres SQLAlchemy URL (postgresql+psycopg2://...)')
+parser.add_argument('--pg', '--target', dest='pg', default=PG_URL, help='Target SQLAlchemy URL (postgresql+psycopg://...; sqlite:/// works for rehearsals)')
 parser.add_argument('--dry-run', action='store_true', help='Do not perform inserts; only show counts')
 parser.add_argument('--limit', type=int, default=0, help='Limit rows per table (0 = no limit)')
-parser.add_argument('--batch', type=int, default=500, help='Batch size for inserts')
+parser.add_argument('--batch', type=int, default=5000, help='Rows per keyset page / INSERT statement')
 parser.add_argument('--tables', nargs='*', help='Optional list of tables to transfer (in order)')
-parser.add_argument('--sleep', type=float, default=0.01, help='Sleep between batches to reduce DB load')
-args = parser.parse_args()
-
-if not args.pg:
-    print('No Postgres URL provided. Set DATABASE_URL in .env or pass --pg')
-    sys.exit(2)
+parser.add_argument('--sleep', type=float, default=0.0, help='Sleep between batches to reduce DB load')
+parser.add_argument('--workers', type=int, default=1, help='Tables copied concurrently (respecting foreign-key order)')
+parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='Checkpoint file recording progress per table')
+parser.add_argument('--restart', action='store_true', help='Ignore (and overwrite) an existing checkpoint')
 
 
 def reflect_tables(engine):
@@ -64,132 +77,248 @@ def table_ordering(metadata):
     return ordered
 
 
-def copy_table(sqlite_engine, pg_engine, table_name, dry_run=False, limit=0, batch=500, sleep=0.01):
-    s_meta = reflect_tables(sqlite_engine)
-    p_meta = reflect_tables(pg_engine)
-
-    if table_name not in s_meta.tables:
-        print(f"Source table {table_name} not found, skipping.")
-        return 0
-
-    s_table = s_meta.tables[table_name]
-    if table_name not in p_meta.tables:
-        print(f"Target table {table_name} not found in Postgres — creating using reflected DDL is not supported by this script.\nPlease run migrations first.")
-        return 0
-
-    p_table = p_meta.tables[table_name]
-
-    # Count rows in source
-    with sqlite_engine.connect() as s_conn:
-        cnt_res = s_conn.execute(select(text('count(1)')).select_from(s_table))
-        src_count = cnt_res.scalar() if cnt_res is not None else 0
-
-    print(f"Table {table_name}: source rows = {src_count}")
-    if dry_run:
-        return src_count
-
-    offset = 0
-    inserted = 0
+def dependency_graph(metadata, tables):
+    """Map each selected table to the selected tables it references via foreign keys."""
+    selected = set(tables)
+    deps = {}
+    for name in tables:
+        parents = set()
+        if name in metadata.tables:
+            for fk in metadata.tables[name].foreign_keys:
+                parent = fk.column.table.name
+                if parent != name and parent in selected:
+                    parents.add(parent)
+        deps[name] = parents
+    return deps
+
+
+def run_dependency_ordered(tables, deps, fn, workers=1):
+    """Call fn(table) for every table, starting each once all of its parents have finished.
+
+    Up to `workers` tables run concurrently. Tables whose parent failed are not started.
+    Returns {table: result}; exits non-zero after the pool drains if any table failed.
+    """
+    workers = max(1, workers)
+    pending = list(tables)
+    done, failed, skipped, results = set(), {}, set(), {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                if len(running) >= workers:
+                    break
+                parents = deps.get(name, set())
+                if parents & (set(failed) | skipped):
+                    pending.remove(name)
+                    skipped.add(name)
+                    print(f"Skipping {name}: a table it references did not copy.")
+                elif parents <= done:
+                    pending.remove(name)
+                    running[pool.submit(fn, name)] = name
+            if not running:
+                if pending:  # cycle among the selected tables
+                    raise SystemExit(f'Cannot schedule tables (circular foreign keys?): {pending}')
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                try:
+                    results[name] = fut.result()
+                    done.add(name)
+                except Exception as e:  # noqa: BLE001
+                    failed[name] = e
+                    print(f"Table {name} failed: {e}")
+    if failed or skipped:
+        raise SystemExit(f'Transfer incomplete. Failed: {sorted(failed)} Skipped: {sorted(skipped)}')
+    return results
+
+
+class Checkpoint:
+    """JSON file with {table: {last_key, read, inserted, done}}, rewritten atomically after each page."""
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {}
+        if path and os.path.exists(path) and not restart:
+            with open(path, 'r', encoding='utf-8') as fh:
+                self.state = json.load(fh)
+
+    def get(self, table):
+        return self.state.get(table, {})
+
+    def update(self, table, **fields):
+        if not self.path:
+            return
+        with self.lock:
+            self.state.setdefault(table, {}).update(fields)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                json.dump(self.state, fh, indent=2, default=str)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+
+
+def key_columns(table):
+    """Columns used for keyset paging: the primary key, else every column (no-PK tables are tiny)."""
+    pk = list(table.primary_key.columns)
+    return pk or list(table.columns)
+
+
+def keyset_pages(conn, table, batch, limit=0, start_after=None):
+    """Yield lists of row mappings in key order, resuming after the key tuple `start_after`."""
+    keys = key_columns(table)
+    key_names = [c.name for c in keys]
+    last = start_after
+    remaining = limit or None
     while True:
-        with sqlite_engine.connect() as s_conn:
-            sel = select(s_table).limit(batch)
-            if limit > 0:
-                sel = select(s_table).limit(min(batch, limit - offset))
-            rows = list(s_conn.execute(sel))
-
+        n = min(batch, remaining) if remaining else batch
+        sel = select(table).order_by(*keys).limit(n)
+        if last is not None:
+            if len(keys) == 1:
+                sel = sel.where(keys[0] > last[0])
+            else:
+                sel = sel.where(tuple_(*keys) > tuple_(*last))
+        rows = conn.execute(sel).mappings().all()
         if not rows:
-            break
-
-        # Prepare insert for target; skip rows that already exist (by primary key)
-        pk_cols = [c.name for c in p_table.primary_key] if p_table.primary_key is not None else []
-
-        insert_rows = []
-        for r in rows:
-            row = r._asdict() if hasattr(r, '_asdict') else dict(r._mapping)
-            if pk_cols:
-                pk_vals = {k: row.get(k) for k in pk_cols}
-                # Simple existence check - if we get an error, assume it doesn't exist and try to insert
-                try:
-                    with pg_engine.connect() as p_conn:
-                        q = select(text('count(1)')).select_from(p_table)
-                        for k, v in pk_vals.items():
-                            q = q.where(text(f"{k} = :{k}"))
-                        exists = p_conn.execute(q, pk_vals).scalar() > 0
-                    if exists:
-                        continue  # skip existing
-                except Exception as e:
-                    print(f"Warning: Could not check existence for {table_name}, attempting insert anyway: {e}")
-                    # Continue with insert attempt
-
-            insert_rows.append(row)
-
-        if not insert_rows:
-            offset += len(rows)
-            if limit > 0 and offset >= limit:
-                break
-            continue
-
-        # Perform batched inserts
-        chunk = []
-        for r in insert_rows:
-            chunk.append(r)
-            if len(chunk) >= batch:
-                with pg_engine.begin() as p_conn:
-                    try:
-                        p_conn.execute(p_table.insert(), chunk)
-                        inserted += len(chunk)
-                    except IntegrityError as e:
-                        print('IntegrityError during insert chunk:', e)
-                chunk = []
+            return
+        last = tuple(rows[-1][k] for k in key_names)
+        yield rows, last
+        if remaining:
+            remaining -= len(rows)
+            if remaining <= 0:
+                return
+
+
+def insert_ignore(target_table, dialect_name):
+    """INSERT that silently skips rows whose key already exists in the target."""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise SystemExit(f'Unsupported target dialect: {dialect_name}')
+    stmt = insert(target_table).on_conflict_do_nothing()
+    pk = list(target_table.primary_key.columns)
+    # RETURNING only reports rows actually inserted, giving an exact count per batch
+    return stmt.returning(*pk) if pk else stmt
+
+
+def fix_sequence(engine, table):
+    if engine.dialect.name != 'postgresql' or 'id' not in table.c:
+        return
+    quoted = engine.dialect.identifier_preparer.quote(table.name)
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"SELECT setval(pg_get_serial_sequence(:tbl, 'id'), (SELECT COALESCE(MAX(id), 0) + 1 FROM {quoted}), false)"),
+                {'tbl': quoted},
+            )
+        print(f"  sequence for {table.name}.id updated")
+    except Exception as e:  # noqa: BLE001
+        print(f"  could not update sequence for {table.name}; run setval manually ({e})")
+
+
+def copy_table(sqlite_engine, target_engine, s_table, t_table, limit=0, batch=5000, sleep=0.0, start_after=None, on_batch=None):
+    """Copy one table by keyset pages. Returns (rows_read, rows_inserted, seconds)."""
+    columns = [c.name for c in s_table.columns if c.name in t_table.c]
+    missing = [c.name for c in s_table.columns if c.name not in t_table.c]
+    if missing:
+        print(f"  {s_table.name}: columns missing in target, not copied: {missing}")
+    stmt = insert_ignore(t_table, target_engine.dialect.name)
+    returns_rows = bool(t_table.primary_key.columns)
+
+    read = inserted = 0
+    started = time.perf_counter()
+    with sqlite_engine.connect() as s_conn:
+        for rows, last_key in keyset_pages(s_conn, s_table, batch, limit=limit, start_after=start_after):
+            payload = [{c: r[c] for c in columns} for r in rows]
+            with target_engine.begin() as t_conn:
+                result = t_conn.execute(stmt, payload)
+                inserted += len(result.all()) if returns_rows else len(payload)
+            read += len(rows)
+            if on_batch:
+                on_batch(s_table.name, last_key, read, inserted)
+            if sleep:
                 time.sleep(sleep)
-        if chunk:
-            with pg_engine.begin() as p_conn:
-                try:
-                    p_conn.execute(p_table.insert(), chunk)
-                    inserted += len(chunk)
-                except IntegrityError as e:
-                    print('IntegrityError during final insert chunk:', e)
-
-        offset += len(rows)
-        if limit > 0 and offset >= limit:
-            break
+    return read, inserted, time.perf_counter() - started
 
-    print(f"Inserted {inserted} rows into {table_name} (skipped existing rows).")
 
-    # Try to fix sequence if table has integer primary key named 'id'
-    if 'id' in p_table.c:
-        try:
-            with pg_engine.begin() as p_conn:
-                p_conn.execute(text("SELECT setval(pg_get_serial_sequence(:tbl, 'id'), (SELECT COALESCE(MAX(id),0) FROM " + table_name + "))"), {'tbl': table_name})
-            print(f"Sequence for {table_name}.id updated.")
-        except Exception:
-            print(f"Could not update sequence for {table_name}; you may need to run setval manually.")
+def count_rows(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar() or 0
 
-    return inserted
 
+def main(argv=None):
+    args = parser.parse_args(argv)
+    if not args.pg:
+        print('No Postgres URL provided. Set DATABASE_URL in .env or pass --pg')
+        return 2
 
-def main():
     sqlite_engine = create_engine(args.sqlite)
-    pg_engine = create_engine(args.pg)
+    target_engine = create_engine(args.pg)
 
-    # Reflect source metadata to get recommended table ordering
+    # Reflect both schemas exactly once
     s_meta = reflect_tables(sqlite_engine)
-    if args.tables:
-        tables = args.tables
-    else:
-        tables = table_ordering(s_meta)
-
-    print('Planned table order:', tables)
-
-    total_inserted = 0
-    for t in tables:
-        print('---')
-        n = copy_table(sqlite_engine, pg_engine, t, dry_run=args.dry_run, limit=args.limit, batch=args.batch, sleep=args.sleep)
-        total_inserted += n if isinstance(n, int) else 0
-
+    t_meta = reflect_tables(target_engine)
+    tables = [t for t in (args.tables or table_ordering(s_meta)) if t in s_meta.tables]
+    deps = dependency_graph(s_meta, tables)
+    print('Planned tables:', tables)
+    print('Depends on:', {t: sorted(p) for t, p in deps.items() if p})
+
+    checkpoint = Checkpoint(None if args.dry_run else args.checkpoint, restart=args.restart)
+    run_id = {'source': args.sqlite, 'target': make_url(args.pg).render_as_string(hide_password=True)}
+    previous = checkpoint.get('__run__')
+    if previous and {k: previous.get(k) for k in run_id} != run_id:
+        print(f'Checkpoint {args.checkpoint} belongs to a different run {previous}; pass --restart to discard it.')
+        return 2
+    checkpoint.update('__run__', **run_id)
+    log_lock = threading.Lock()
+
+    def log(msg):
+        with log_lock:
+            print(msg, flush=True)
+
+    def on_batch(name, last_key, read, inserted):
+        # Only real primary keys are resumable; no-PK tables simply re-run (duplicates are ignored)
+        resumable = bool(s_meta.tables[name].primary_key.columns)
+        checkpoint.update(name, last_key=list(last_key) if resumable else None, read=read, inserted=inserted, done=False)
+
+    def transfer(name):
+        s_table = s_meta.tables[name]
+        src_count = count_rows(sqlite_engine, s_table)
+        state = checkpoint.get(name)
+        if state.get('done'):
+            log(f"{name}: already complete per checkpoint ({state.get('read', 0)} rows), skipping")
+            return 0
+        log(f"{name}: source rows = {src_count}")
+        if args.dry_run or src_count == 0:
+            return 0
+        if name not in t_meta.tables:
+            log(f"{name}: target table not found — please run migrations first.")
+            return 0
+        t_table = t_meta.tables[name]
+        start_after = tuple(state['last_key']) if state.get('last_key') else None
+        if start_after:
+            log(f"{name}: resuming after key {list(start_after)}")
+        read, inserted, secs = copy_table(sqlite_engine, target_engine, s_table, t_table,
+                                          limit=args.limit, batch=args.batch, sleep=args.sleep,
+                                          start_after=start_after, on_batch=on_batch)
+        rate = read / secs if secs > 0 else float(read)
+        log(f"{name}: read {read}, inserted {inserted}, skipped existing {read - inserted} in {secs:.2f}s ({rate:,.0f} rows/s)")
+        fix_sequence(target_engine, t_table)
+        if not args.limit:
+            checkpoint.update(name, done=True)
+        return inserted
+
+    started = time.perf_counter()
+    results = run_dependency_ordered(tables, deps, transfer, workers=args.workers)
     print('---')
-    print('Done. Total inserted (approx):', total_inserted)
+    print(f'Done. Total inserted: {sum(results.values())} in {time.perf_counter() - started:.2f}s')
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Flutterwave and Mailtrap APIs, for load tests and offline runs.
+
+Usage (git-bash):
+  python scripts/stub_gateways.py                                   # http://127.0.0.1:8089
+  python scripts/stub_gateways.py --latency-ms 250 --jitter-ms 100 --error-rate 0.02
+  python scripts/stub_gateways.py --port 9000 --mail-latency-ms 80
+
+Point the app at it (the secret only needs the FLWSECK_ prefix):
+  FLW_BASE_URL=http://127.0.0.1:8089/v3
+  FLW_SECRET_KEY=FLWSECK_TEST-stub
+  FLW_HASH=stub-hash
+  MAILTRAP_API_KEY=stub
+  MAILTRAP_API_URL=http://127.0.0.1:8089/api/send
+
+Endpoints:
+  POST /v3/payments                              -> payment link (amount/currency remembered per tx_ref)
+  GET  /v3/transactions/verify_by_reference      -> successful transaction matching the initialised amount
+  GET  /v3/transactions/<id>/verify
+  POST /api/send                                 -> Mailtrap-style {"success": true, "message_ids": [...]}
+  GET  /stats                                    -> request / error counters
+
+Every API call sleeps latency +/- jitter and fails with HTTP 503 at --error-rate.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+parser = argparse.ArgumentParser(description='Local Flutterwave + Mailtrap stub server')
+parser.add_argument('--host', default='127.0.0.1')
+parser.add_argument('--port', type=int, default=8089)
+parser.add_argument('--latency-ms', type=float, default=150, help='Mean Flutterwave response latency')
+parser.add_argument('--jitter-ms', type=float, default=50, help='Uniform +/- jitter added to each latency')
+parser.add_argument('--mail-latency-ms', type=float, default=100, help='Mean Mailtrap send latency')
+parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls answered with HTTP 503')
+parser.add_argument('--quiet', action='store_true', help='Do not log each request')
+
+
+class StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.transactions = {}  # tx_ref -> {'id', 'amount', 'currency', 'customer'}
+        self.counts = {}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = 'BrandVoiceStub/1.0'
+    state = StubState()
+    opts = None
+
+    def log_message(self, fmt, *args):
+        if not self.opts.quiet:
+            super().log_message(fmt, *args)
+
+    def _json(self, status, body):
+        raw = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return {}
+
+    def _simulate(self, name, latency_ms):
+        """Sleep and maybe fail; returns True when the call should error."""
+        self.state.count(name)
+        delay = max(0.0, latency_ms + random.uniform(-self.opts.jitter_ms, self.opts.jitter_ms))
+        time.sleep(delay / 1000)
+        if random.random() < self.opts.error_rate:
+            self.state.count(name + '_error')
+            self._json(503, {'status': 'error', 'message': 'stub injected failure'})
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if url.path == '/stats':
+            with self.state.lock:
+                return self._json(200, {'counts': dict(self.state.counts), 'transactions': len(self.state.transactions)})
+        if url.path == '/v3/transactions/verify_by_reference':
+            if self._simulate('verify', self.opts.latency_ms):
+                return
+            tx_ref = (parse_qs(url.query).get('tx_ref') or [''])[0]
+            return self._verified(tx_ref)
+        if len(parts) == 4 and parts[:2] == ['v3', 'transactions'] and parts[3] == 'verify':
+            if self._simulate('verify', self.opts.latency_ms):
+                return
+            with self.state.lock:
+                tx_ref = next((ref for ref, t in self.state.transactions.items() if str(t['id']) == parts[2]), '')
+            return self._verified(tx_ref)
+        if url.path == '/checkout':
+            return self._json(200, {'status': 'success', 'message': 'stub checkout page', 'tx_ref': parse_qs(url.query).get('tx_ref')})
+        self._json(404, {'status': 'error', 'message': 'unknown stub endpoint'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/v3/payments':
+            body = self._body()
+            if self._simulate('payments', self.opts.latency_ms):
+                return
+            tx_ref = body.get('tx_ref') or str(uuid.uuid4())
+            with self.state.lock:
+                self.state.transactions[tx_ref] = {
+                    'id': random.randint(10 ** 6, 10 ** 9),
+                    'amount': float(body.get('amount') or 0),
+                    'currency': body.get('currency'),
+                    'customer': body.get('customer') or {},
+                }
+            link = f'http://{self.headers.get("Host")}/checkout?tx_ref={tx_ref}'
+            return self._json(200, {'status': 'success', 'message': 'Hosted Link', 'data': {'link': link}})
+        if url.path == '/api/send':
+            body = self._body()
+            if self._simulate('mail', self.opts.mail_latency_ms):
+                return
+            ids = [str(uuid.uuid4()) for _ in body.get('to') or []]
+            return self._json(200, {'success': True, 'message_ids': ids})
+        self._json(404, {'status': 'error', 'message': 'unknown stub endpoint'})
+
+    def _verified(self, tx_ref):
+        with self.state.lock:
+            tx = self.state.transactions.get(tx_ref)
+        if not tx:
+            return self._json(404, {'status': 'error', 'message': 'No transaction was found for this id', 'data': None})
+        self._json(200, {'status': 'success', 'message': 'Transaction fetched successfully', 'data': {
+            'id': tx['id'], 'tx_ref': tx_ref, 'flw_ref': f'FLW-STUB-{tx["id"]}', 'status': 'successful',
+            'amount': tx['amount'], 'currency': tx['currency'], 'customer': tx['customer'],
+            'processor_response': 'Approved by stub',
+        }})
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    StubHandler.opts = args
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f'Stub gateways on http://{args.host}:{args.port} (FLW_BASE_URL=http://{args.host}:{args.port}/v3, '
+          f'MAILTRAP_API_URL=http://{args.host}:{args.port}/api/send)', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
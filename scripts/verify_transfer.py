@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Verify a SQLite -> PostgreSQL transfer by comparing chunked checksums per table.
+
+Usage (git-bash):
+  python scripts/verify_transfer.py
+  python scripts/verify_transfer.py --tables invoice invoice_item --chunk 20000
+  python scripts/verify_transfer.py --pg sqlite:///instance/rehearsal.db --json verify.json
+
+Every row is rendered as one normalized text line (NULL, bool, float, datetime and blob
+formatting made identical across databases) and each primary-key range gets
+md5(row lines joined in key order). Postgres computes the digests itself, one
+GROUP BY bucket query with md5(string_agg(...)) per level, so no rows leave the
+server; the SQLite side is local and streams its rows through the same normalization
+in Python. Ranges whose digests differ are split further until they are --leaf keys
+wide, and only those leaf ranges are read from the target and diffed row by row.
+Transfer from Postgres therefore grows with the number of differences, not with table
+size, and any changed value is detected.
+
+Exit code 0 when everything matches, 1 when differences were found.
+"""
+from sqlalchemy import create_engine, select, func, case, cast, literal, literal_column, Numeric, Text
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal, Context, ROUND_HALF_UP
+from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+
+# Importable however the script is invoked (repo root, scripts/ or elsewhere)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sqlite_to_postgres import SQLITE_URL, PG_URL, reflect_tables, table_ordering  # noqa: E402
+
+load_dotenv()
+
+parser = argparse.ArgumentParser(description='Compare SQLite and Postgres tables by chunked checksums')
+parser.add_argument('--sqlite', default=SQLITE_URL, help='Source SQLite URL')
+parser.add_argument('--pg', '--target', dest='pg', default=PG_URL, help='Target SQLAlchemy URL')
+parser.add_argument('--tables', nargs='*', help='Tables to verify (default: all tables in the source)')
+parser.add_argument('--chunk', type=int, default=10000, help='Primary-key range width per top-level chunk')
+parser.add_argument('--leaf', type=int, default=64, help='Range width at which mismatches are diffed row by row')
+parser.add_argument('--workers', type=int, default=2, help='Tables verified concurrently')
+parser.add_argument('--show', type=int, default=10, help='Max differing keys printed per category')
+parser.add_argument('--json', help='Write the full report to this file')
+
+NULL = '\\N'
+FIELD_SEP = '\x1f'
+ROW_SEP = '\n'
+# Floats are compared at 6 decimals after Postgres' float8 -> numeric conversion (15
+# significant digits), rounding half away from zero like numeric round()
+FLOAT_QUANTUM = Decimal('0.000001')
+_DECIMAL_CONTEXT = Context(prec=80)
+
+
+def normalize(value):
+    """Text form of a column value; Side._sql_text renders the same text inside Postgres."""
+    if value is None:
+        return NULL
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (float, Decimal)):
+        d = Decimal(f'{float(value):.15g}').quantize(FLOAT_QUANTUM, rounding=ROUND_HALF_UP, context=_DECIMAL_CONTEXT)
+        return str(d.copy_abs() if d.is_zero() else d)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def row_text(row, columns):
+    return FIELD_SEP.join(normalize(row[c]) for c in columns)
+
+
+def row_digest(row, columns):
+    return hashlib.sha1(row_text(row, columns).encode('utf-8')).digest()
+
+
+class Side:
+    """One database's view of a table restricted to the compared columns."""
+
+    def __init__(self, engine, table, columns, pk):
+        self.engine = engine
+        self.table = table
+        self.columns = columns
+        self.cols = [table.c[c] for c in columns]
+        self.pk = table.c[pk]
+        self.in_database = engine.dialect.name == 'postgresql'
+
+    def _sql_text(self, col):
+        """SQL rendering normalize() output for col (Postgres)."""
+        try:
+            py = col.type.python_type
+        except NotImplementedError:
+            py = None
+        if py is bool:
+            expr = case((col.is_(True), '1'), (col.is_(False), '0'))
+        elif py in (float, Decimal):
+            expr = cast(func.round(cast(col, Numeric), 6), Text)
+        elif py is datetime:
+            expr = func.to_char(col, 'YYYY-MM-DD HH24:MI:SS.US')
+        elif py is date:
+            expr = func.to_char(col, 'YYYY-MM-DD')
+        elif py is bytes:
+            expr = func.encode(col, 'hex')
+        else:
+            expr = cast(col, Text)
+        return func.coalesce(expr, NULL)
+
+    def bounds(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.min(self.pk), func.max(self.pk))).one()
+
+    def range_digests(self, lo, hi, width):
+        """{bucket: (rows, md5 of the row lines)} for [lo, hi) split into width-key buckets (bucket = (key - lo) // width)."""
+        if self.in_database:
+            from sqlalchemy.dialects.postgresql import aggregate_order_by
+            line = func.concat_ws(literal(FIELD_SEP), *[self._sql_text(c) for c in self.cols])
+            bucket = ((self.pk - lo) // width).label('bucket')
+            sel = (select(bucket, func.count(), func.md5(func.string_agg(line, aggregate_order_by(literal(ROW_SEP), self.pk))))
+                   .where(self.pk >= lo, self.pk < hi).group_by(literal_column('bucket')))
+            with self.engine.connect() as conn:
+                return {b: (n, digest) for b, n, digest in conn.execute(sel)}
+        out = {}
+        current, lines = None, []
+
+        def flush():
+            if lines:
+                out[current] = (len(lines), hashlib.md5(ROW_SEP.join(lines).encode('utf-8')).hexdigest())
+
+        for row in self.rows(lo, hi):
+            b = (row[self.pk.name] - lo) // width
+            if b != current:
+                flush()
+                current, lines = b, []
+            lines.append(row_text(row, self.columns))
+        flush()
+        return out
+
+    def rows(self, lo, hi):
+        sel = select(*self.cols).where(self.pk >= lo, self.pk < hi).order_by(self.pk)
+        with self.engine.connect() as conn:
+            return conn.execute(sel).mappings().all()
+
+
+def verify_table(name, s_meta, t_meta, s_engine, t_engine, chunk, leaf):
+    report = {'table': name, 'missing_in_target': [], 'extra_in_target': [], 'changed': [], 'chunks': 0, 'mismatched_chunks': 0}
+    if name not in t_meta.tables:
+        report['error'] = 'table missing in target'
+        return report
+    s_table, t_table = s_meta.tables[name], t_meta.tables[name]
+    columns = sorted(c.name for c in s_table.columns if c.name in t_table.c)
+    report['skipped_columns'] = sorted(c.name for c in s_table.columns if c.name not in t_table.c)
+    pk_cols = [c.name for c in s_table.primary_key.columns]
+    try:
+        int_pk = len(pk_cols) == 1 and s_table.c[pk_cols[0]].type.python_type is int
+    except NotImplementedError:
+        int_pk = False
+    if not int_pk:
+        # Non-integer / composite keys only exist on tiny tables (alembic_version): compare whole
+        keys = pk_cols or columns
+        with s_engine.connect() as sc, t_engine.connect() as tc:
+            src = {tuple(r[k] for k in keys): row_digest(r, columns) for r in sc.execute(select(*[s_table.c[c] for c in columns])).mappings()}
+            dst = {tuple(r[k] for k in keys): row_digest(r, columns) for r in tc.execute(select(*[t_table.c[c] for c in columns])).mappings()}
+        _diff_rows(src, dst, report)
+        report['chunks'] = 1
+        report['mismatched_chunks'] = int(bool(report['missing_in_target'] or report['extra_in_target'] or report['changed']))
+        return report
+
+    pk = pk_cols[0]
+    if pk not in columns:
+        report['error'] = f'primary key {pk} missing in target'
+        return report
+    src, dst = Side(s_engine, s_table, columns, pk), Side(t_engine, t_table, columns, pk)
+    bounds = [b for b in (*src.bounds(), *dst.bounds()) if b is not None]
+    if not bounds:
+        return report
+    lo_all, hi_all = min(bounds), max(bounds) + 1
+
+    def both(method, *args):
+        # Query both sides concurrently
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            fs, fd = pool.submit(getattr(src, method), *args), pool.submit(getattr(dst, method), *args)
+            return fs.result(), fd.result()
+
+    def diff_leaf(lo, hi):
+        s_rows, d_rows = both('rows', lo, hi)
+        _diff_rows({(r[pk],): row_digest(r, columns) for r in s_rows},
+                   {(r[pk],): row_digest(r, columns) for r in d_rows}, report)
+
+    def mismatched(lo, hi, width):
+        """Start keys of the width-wide buckets of [lo, hi) whose digests differ."""
+        s_dig, d_dig = both('range_digests', lo, hi, width)
+        return [lo + b * width for b in sorted(s_dig.keys() | d_dig.keys()) if s_dig.get(b) != d_dig.get(b)]
+
+    def drill(lo, hi):
+        if hi - lo <= leaf:
+            diff_leaf(lo, hi)
+            return
+        half = (hi - lo + 1) // 2
+        for start in mismatched(lo, hi, half):
+            drill(start, min(start + half, hi))
+
+    report['chunks'] = len(range(lo_all, hi_all, chunk))
+    for lo in mismatched(lo_all, hi_all, chunk):
+        report['mismatched_chunks'] += 1
+        drill(lo, min(lo + chunk, hi_all))
+    return report
+
+
+def _diff_rows(src, dst, report):
+    for key in sorted(src.keys() - dst.keys()):
+        report['missing_in_target'].append(list(key))
+    for key in sorted(dst.keys() - src.keys()):
+        report['extra_in_target'].append(list(key))
+    for key in sorted(src.keys() & dst.keys()):
+        if src[key] != dst[key]:
+            report['changed'].append(list(key))
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    if args.chunk < 1 or args.leaf < 1:
+        parser.error('--chunk and --leaf must be at least 1')
+    if not args.pg:
+        print('No target URL provided. Set DATABASE_URL in .env or pass --pg')
+        return 2
+    s_engine = create_engine(args.sqlite)
+    t_engine = create_engine(args.pg)
+    s_meta = reflect_tables(s_engine)
+    t_meta = reflect_tables(t_engine)
+    tables = [t for t in (args.tables or table_ordering(s_meta)) if t in s_meta.tables]
+
+    lock = threading.Lock()
+    reports = []
+
+    def run(name):
+        rep = verify_table(name, s_meta, t_meta, s_engine, t_engine, args.chunk, args.leaf)
+        with lock:
+            reports.append(rep)
+            diffs = len(rep['missing_in_target']) + len(rep['extra_in_target']) + len(rep['changed'])
+            status = rep.get('error') or ('OK' if not diffs else f'{diffs} differing rows')
+            print(f"{name}: {status} ({rep['chunks']} chunks, {rep['mismatched_chunks']} mismatched)", flush=True)
+            for kind in ('missing_in_target', 'extra_in_target', 'changed'):
+                if rep[kind]:
+                    more = f" (+{len(rep[kind]) - args.show} more)" if len(rep[kind]) > args.show else ''
+                    print(f"  {kind}: {rep[kind][:args.show]}{more}")
+            if rep.get('skipped_columns'):
+                print(f"  columns not in target (not compared): {rep['skipped_columns']}")
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        list(pool.map(run, tables))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(sorted(reports, key=lambda r: r['table']), fh, indent=2, default=str)
+    bad = [r['table'] for r in reports if r.get('error') or r['missing_in_target'] or r['extra_in_target'] or r['changed']]
+    print('---')
+    print('All tables match.' if not bad else f'Differences found in: {sorted(bad)}')
+    return 1 if bad else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+"""Production WSGI entry point: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+The app is built and warmed once in the Gunicorn master (preload_app) so forked workers
+share compiled templates and imported modules copy-on-write instead of each paying for
+them on their first requests. Migrations are not run here; see run_migrations.py.
+"""
+import os
+from app import create_app, warm
+
+app = warm(create_app(os.environ.get('APP_CONFIG', 'config.ProdConfig')))